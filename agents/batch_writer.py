@@ -0,0 +1,95 @@
+import asyncio
+import logging
+from collections import defaultdict
+
+from googleapiclient.http import BatchHttpRequest
+
+logger = logging.getLogger(__name__)
+
+# Google caps Calendar batch requests at 50 calls.
+MAX_BATCH_SIZE = 50
+
+
+def execute_batch(service, requests, batch_uri=None):
+    """Run requests as HTTP batch calls; returns (response, exception) pairs in request order."""
+    results = [None] * len(requests)
+
+    def callback(request_id, response, exception):
+        results[int(request_id)] = (response, exception)
+
+    for offset in range(0, len(requests), MAX_BATCH_SIZE):
+        if batch_uri:
+            batch = BatchHttpRequest(callback=callback, batch_uri=batch_uri)
+        else:
+            batch = service.new_batch_http_request(callback=callback)
+        for i, request in enumerate(requests[offset:offset + MAX_BATCH_SIZE], start=offset):
+            batch.add(request, request_id=str(i))
+        batch.execute()
+    return results
+
+
+class BatchWriter:
+    """Coalesces per-user Calendar writes submitted within `window` seconds into batch calls."""
+
+    def __init__(self, window=0.02, batch_uri=None, runner=None, governor=None):
+        self.window = window
+        self.batch_uri = batch_uri
+        self.runner = runner
+        # Each request in a batch counts against the quota, so a batch takes one write token per request.
+        self.governor = governor
+        self.stats = {"requests": 0, "batches": 0}
+        self._pending = {}
+        # The loop only holds weak references to tasks; keep in-flight flushes alive until they finish.
+        self._flushes = set()
+        # httplib2 connections aren't thread-safe, so each user's batches go out one at a time.
+        self._locks = defaultdict(asyncio.Lock)
+
+    async def submit(self, user_key, service, request):
+        future = asyncio.get_running_loop().create_future()
+        queue = self._pending.get(user_key)
+        if queue is None:
+            queue = self._pending[user_key] = []
+            asyncio.get_running_loop().call_later(self.window, self._schedule_flush, user_key, service)
+        queue.append((request, future))
+        if len(queue) >= MAX_BATCH_SIZE:
+            self._schedule_flush(user_key, service)
+        return await future
+
+    def _schedule_flush(self, user_key, service):
+        queue = self._pending.pop(user_key, None)
+        if queue:
+            task = asyncio.ensure_future(self._flush(user_key, service, queue))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushed)
+
+    def _flushed(self, task):
+        self._flushes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Batch flush failed", exc_info=task.exception())
+
+    async def _call(self, user_key, fn, *args):
+        if self.runner is not None:
+            return await self.runner.run(user_key, fn, *args)
+        return await asyncio.to_thread(fn, *args)
+
+    async def _flush(self, user_key, service, queue):
+        self.stats["requests"] += len(queue)
+        self.stats["batches"] += 1
+        requests = [request for request, _ in queue]
+        try:
+            if self.governor is not None:
+                await self.governor.acquire(user_key, cost=len(requests), write=True)
+            async with self._locks[user_key]:
+                if len(requests) == 1:
+                    results = [(await self._call(user_key, requests[0].execute), None)]
+                else:
+                    results = await self._call(user_key, execute_batch, service, requests, self.batch_uri)
+        except Exception as e:
+            results = [(None, e)] * len(queue)
+        for (_, future), (response, exception) in zip(queue, results):
+            if future.done():
+                continue
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(response)
@@ -0,0 +1,55 @@
+import asyncio
+import functools
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.telemetry import metrics
+
+
+class AgentOverloaded(Exception):
+    pass
+
+
+class BlockingRunner:
+    """Runs blocking Google client calls on a bounded thread pool so the agent's event loop stays free.
+
+    Each user gets `per_user` concurrent calls (1 by default: a user's cached service shares
+    one httplib2 connection, which isn't thread-safe). Once `max_pending` calls are queued,
+    new ones are rejected with AgentOverloaded instead of piling up.
+    """
+
+    def __init__(self, max_workers=16, per_user=1, max_pending=256):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.stats = {"calls": 0, "rejected": 0, "pending": 0, "peak_pending": 0}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="google-api")
+        self._user_slots = defaultdict(lambda: asyncio.Semaphore(per_user))
+
+    async def run(self, user_key, fn, *args, **kwargs):
+        if self.stats["pending"] >= self.max_pending:
+            self.stats["rejected"] += 1
+            raise AgentOverloaded(f"{self.stats['pending']} Google API calls already queued")
+        self.stats["pending"] += 1
+        self.stats["peak_pending"] = max(self.stats["peak_pending"], self.stats["pending"])
+        queued_at = time.perf_counter()
+        try:
+            async with self._user_slots[user_key]:
+                self.stats["calls"] += 1
+                loop = asyncio.get_running_loop()
+                metrics.observe("runner_wait_seconds", time.perf_counter() - queued_at)
+                return await loop.run_in_executor(self._executor, functools.partial(self._timed, fn, *args, **kwargs))
+        finally:
+            self.stats["pending"] -= 1
+
+    @staticmethod
+    def _timed(fn, *args, **kwargs):
+        # Timed on the worker thread, so the histogram shows the call itself and not the queueing.
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            metrics.observe("google_call_seconds", time.perf_counter() - started, call=getattr(fn, "__name__", "call"))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
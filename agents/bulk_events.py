@@ -0,0 +1,69 @@
+from zoneinfo import ZoneInfo
+
+from dateutil.rrule import rrulestr
+
+from agents.slot_finder import DEFAULT_TIME_ZONE, format_slot, to_datetime
+from models.calendar_intent import EventSpec
+
+# Upper bound on occurrences one create_events intent may expand to; open-ended rules stop here.
+MAX_BULK_EVENTS = 100
+
+
+def expand_specs(specs, limit=MAX_BULK_EVENTS, time_zone=DEFAULT_TIME_ZONE):
+    """Expand RRULE specs into single-occurrence EventSpecs; returns (items, truncated)."""
+    tz = ZoneInfo(time_zone)
+    items = []
+    for spec in specs:
+        if len(items) >= limit:
+            return items, True
+        try:
+            start, end = to_datetime(spec.start_time), to_datetime(spec.end_time)
+            if end <= start:
+                raise ValueError("end_time must be after start_time")
+        except (TypeError, ValueError) as e:
+            items.append(EventSpec(title=spec.title, start_time=spec.start_time, end_time=spec.end_time,
+                                   status="failed", message=f"❌ {spec.title}: {e}"))
+            continue
+        if not spec.rrule:
+            items.append(EventSpec(title=spec.title, start_time=start.isoformat(), end_time=end.isoformat()))
+            continue
+        # Expand in the user's zone so a 9:00 standup stays at 9:00 across DST changes.
+        duration = end - start
+        try:
+            rule = rrulestr(spec.rrule.removeprefix("RRULE:"), dtstart=start.astimezone(tz))
+            for occurrence in rule:
+                if len(items) >= limit:
+                    return items, True
+                items.append(EventSpec(title=spec.title, start_time=occurrence.isoformat(),
+                                       end_time=(occurrence + duration).isoformat()))
+        except (TypeError, ValueError) as e:
+            items.append(EventSpec(title=spec.title, start_time=spec.start_time, end_time=spec.end_time,
+                                   rrule=spec.rrule, status="failed", message=f"❌ {spec.title}: bad recurrence ({e})"))
+    return items, False
+
+
+def mark_conflicts(items, conflicts):
+    """Set status/message on each checkable item from its busy blocks (same order as checkable_ranges)."""
+    accepted = []
+    checkable = [item for item in items if item.status != "failed"]
+    for item, blocks in zip(checkable, conflicts):
+        start, end = to_datetime(item.start_time), to_datetime(item.end_time)
+        when = format_slot(start, end)
+        clashes = [block.summary for block in blocks]
+        # Items in the same request can collide with each other too.
+        clashes += [title for other_start, other_end, title in accepted if other_start < end and start < other_end]
+        if clashes:
+            item.status = "conflict"
+            item.message = f"❌ {item.title} {when}: conflicts with {', '.join(clashes)}"
+        else:
+            item.status = "free"
+            item.message = f"✅ {item.title} {when}"
+            accepted.append((start, end, item.title))
+
+
+def checkable_ranges(items):
+    return [(item.start_time, item.end_time) for item in items if item.status != "failed"]
+
+
+def summarize(items, heading):
+    return "\n".join([heading, *(f"- {item.message}" for item in items)])
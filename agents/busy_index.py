@@ -0,0 +1,212 @@
+import bisect
+import datetime
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from zoneinfo import ZoneInfo
+
+# The calendar's own time zone; event_body in calendar_agent writes events in the same one.
+DEFAULT_TIME_ZONE = "America/Los_Angeles"
+
+BusyBlock = namedtuple("BusyBlock", ["start", "end", "event_id", "summary"])
+
+
+def to_timestamp(value, time_zone=DEFAULT_TIME_ZONE):
+    # Accepts an ISO string or a Calendar API time object ({"dateTime": ...} / {"date": ...}).
+    # All-day dates and times without an offset are read in the event's time zone (else the
+    # calendar's), not in UTC: event_body books such a time with that same timeZone.
+    if isinstance(value, dict):
+        time_zone = value.get("timeZone") or time_zone
+        value = value.get("dateTime") or value.get("date")
+    if len(value) == 10:
+        return datetime.datetime.combine(datetime.date.fromisoformat(value), datetime.time(), ZoneInfo(time_zone)).timestamp()
+    # freeBusy and some clients send "Z", which fromisoformat only accepts from Python 3.11.
+    dt = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=ZoneInfo(time_zone))
+    return dt.timestamp()
+
+
+def event_to_block(event):
+    if event.get("status") == "cancelled" or event.get("transparency") == "transparent":
+        return None
+    if "start" not in event or "end" not in event:
+        return None
+    return BusyBlock(
+        to_timestamp(event["start"]),
+        to_timestamp(event["end"]),
+        event["id"],
+        event.get("summary", "(no title)"),
+    )
+
+
+# Partial-response projection: only what the busy index, the store and read_events use.
+EVENT_FIELDS = "id,status,summary,start,end,transparency,htmlLink"
+
+
+def iter_pages(service, page_size=250, first_page_size=None, charge=None, **params):
+    # Yields one list of events per API page, following nextPageToken lazily.
+    # A small first page gets something on screen sooner; later pages use the full size.
+    # charge(), if given, is called before each page request (quota accounting).
+    page_token = None
+    max_results = first_page_size or page_size
+    while True:
+        if charge is not None:
+            charge()
+        response = service.events().list(
+            calendarId="primary",
+            singleEvents=True,
+            orderBy="startTime",
+            maxResults=max_results,
+            pageToken=page_token,
+            fields=f"nextPageToken,items({EVENT_FIELDS})",
+            **params,
+        ).execute()
+        yield response.get("items", [])
+        max_results = page_size
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return
+
+
+def fetch_window(service, time_min, time_max, charge=None):
+    return [event for page in iter_pages(service, charge=charge, timeMin=time_min, timeMax=time_max) for event in page]
+
+
+def load_live(user_key, service, time_min, time_max):
+    return fetch_window(service, time_min, time_max)
+
+
+class BusyIndex:
+    """Busy blocks for one user over [window_start, window_end), sorted by start time."""
+
+    def __init__(self, window_start, window_end):
+        self.window_start = window_start
+        self.window_end = window_end
+        self.synced_at = time.monotonic()
+        self._starts = []
+        self._blocks = []
+        self._by_id = {}
+        self._max_duration = 0.0
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def covers(self, start, end):
+        return self.window_start <= start and end <= self.window_end
+
+    def add(self, block):
+        self.remove(block.event_id)
+        i = bisect.bisect_right(self._starts, block.start)
+        self._starts.insert(i, block.start)
+        self._blocks.insert(i, block)
+        self._by_id[block.event_id] = block.start
+        self._max_duration = max(self._max_duration, block.end - block.start)
+
+    def remove(self, event_id):
+        start = self._by_id.pop(event_id, None)
+        if start is None:
+            return None
+        i = bisect.bisect_left(self._starts, start)
+        while self._blocks[i].event_id != event_id:
+            i += 1
+        del self._starts[i]
+        return self._blocks.pop(i)
+
+    def overlapping(self, start, end):
+        # Only blocks starting in (start - longest block, end) can overlap [start, end).
+        lo = bisect.bisect_right(self._starts, start - self._max_duration)
+        hi = bisect.bisect_left(self._starts, end)
+        return [b for b in self._blocks[lo:hi] if b.end > start]
+
+
+class BusyIndexCache:
+    """Per-user BusyIndex, warmed from a windowed load and kept current by local writes."""
+
+    def __init__(self, window_days=30, max_age=300, max_users=256, loader=load_live):
+        self.window = datetime.timedelta(days=window_days)
+        self.max_age = max_age
+        self.max_users = max_users
+        self.loader = loader
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resync(self, user_key, service):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        window_start = now - datetime.timedelta(days=1)
+        window_end = now + self.window
+        events = self.loader(user_key, service, window_start.isoformat(), window_end.isoformat())
+        index = BusyIndex(window_start.timestamp(), window_end.timestamp())
+        for event in events:
+            block = event_to_block(event)
+            if block:
+                index.add(block)
+        with self._lock:
+            self._indexes[user_key] = index
+            self._indexes.move_to_end(user_key)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+        return index
+
+    def get(self, user_key, service):
+        with self._lock:
+            index = self._indexes.get(user_key)
+            if index is not None:
+                self._indexes.move_to_end(user_key)
+        if index is None or time.monotonic() - index.synced_at > self.max_age:
+            index = self.resync(user_key, service)
+        return index
+
+    def due(self, user_key, start_time, end_time, within=60):
+        """Whether a lookup of [start_time, end_time) in the next `within` seconds would have to resync first."""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        window_start, window_end = (now - datetime.timedelta(days=1)).timestamp(), (now + self.window).timestamp()
+        if not (window_start <= to_timestamp(start_time) and to_timestamp(end_time) <= window_end):
+            # Ranges outside the window are loaded on every lookup, so there is nothing to warm ahead of time.
+            return False
+        with self._lock:
+            index = self._indexes.get(user_key)
+        return index is None or time.monotonic() + within - index.synced_at > self.max_age
+
+    def conflicts(self, user_key, service, start_time, end_time):
+        return self.conflicts_many(user_key, service, [(start_time, end_time)])[0]
+
+    def conflicts_many(self, user_key, service, ranges):
+        # One lookup for the span of all ranges, then each range is answered locally.
+        spans = [(to_timestamp(start), to_timestamp(end)) for start, end in ranges]
+        if not spans:
+            return []
+        low, high = min(start for start, _ in spans), max(end for _, end in spans)
+        index = self.get(user_key, service)
+        if index.covers(low, high):
+            with self._lock:
+                return [index.overlapping(start, end) for start, end in spans]
+        # Outside the indexed window: go to the loader once for the whole span.
+        span_start = datetime.datetime.fromtimestamp(low, datetime.timezone.utc).isoformat()
+        span_end = datetime.datetime.fromtimestamp(high, datetime.timezone.utc).isoformat()
+        span_index = BusyIndex(low, high)
+        for event in self.loader(user_key, service, span_start, span_end):
+            block = event_to_block(event)
+            if block:
+                span_index.add(block)
+        return [span_index.overlapping(start, end) for start, end in spans]
+
+    def record_upsert(self, user_key, event):
+        with self._lock:
+            index = self._indexes.get(user_key)
+            if index is None:
+                return
+            index.remove(event.get("id"))
+            block = event_to_block(event)
+            if block:
+                index.add(block)
+
+    def record_delete(self, user_key, event_id):
+        with self._lock:
+            index = self._indexes.get(user_key)
+            if index is not None:
+                index.remove(event_id)
+
+    def invalidate(self, user_key):
+        with self._lock:
+            self._indexes.pop(user_key, None)
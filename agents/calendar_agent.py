@@ -1,89 +1,373 @@
+import asyncio
 import datetime
+import os
+import uuid
 from uagents import Agent, Context, Protocol
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-from models.calendar_intent import CalendarIntent
+from models.calendar_intent import CalendarIntent, TimeSlot
+from agents.service_cache import ServiceCache
+from agents.shard_ring import HashRing
+from agents.credential_store import CREDENTIAL_FIELDS, open_credential_store
+from agents.busy_index import DEFAULT_TIME_ZONE, BusyIndexCache
+from agents.event_store import EventStore
+from agents.calendar_sync import CalendarSync
+from agents.batch_writer import BatchWriter
+from agents.write_outbox import WriteOutbox, client_event_id
+from agents.blocking_runner import BlockingRunner, AgentOverloaded
+from agents.rate_governor import RateLimited, open_governor
+from agents.telemetry import Trace, activate, metrics, profiled, span
+from agents.result_push import push_result
+from agents.slot_finder import find_free_slots, format_slot, query_busy, to_datetime
+from agents.event_reader import PAGE_SIZE, format_event, read_range
+from agents.bulk_events import MAX_BULK_EVENTS, checkable_ranges, expand_specs, mark_conflicts, summarize
+
+# Sharded mode: CALENDAR_SHARDS workers, each with its own seed, port and local state,
+# owning the users the hash ring assigns to CALENDAR_SHARD.
+SHARD = int(os.environ.get("CALENDAR_SHARD", "0"))
+SHARDS = int(os.environ.get("CALENDAR_SHARDS", "1"))
+PORT = int(os.environ.get("CALENDAR_AGENT_BASE_PORT", "8001")) + SHARD
+shard_ring = HashRing(range(SHARDS))
+
+
+def shard_path(path):
+    root, ext = os.path.splitext(path)
+    return path if SHARDS == 1 else f"{root}-{SHARD}{ext}"
+
 
 calendar_agent = Agent(
-    name="calendar_agent",
-    seed="calendar secret",
-    port=8001,
-    endpoint=["http://localhost:8001/submit"]
+    name="calendar_agent" if SHARDS == 1 else f"calendar_agent_{SHARD}",
+    seed="calendar secret" if SHARDS == 1 else f"calendar secret {SHARD}",
+    port=PORT,
+    endpoint=[f"http://localhost:{PORT}/submit"]
 )
 
 calendar_protocol = Protocol("calendar_protocol")
 
+# The UI registers credentials here and sends only an opaque session token.
+credential_store = open_credential_store()
+# Authorized Calendar clients are reused across intents from the same user.
+service_cache = ServiceCache()
+# Events live in a local SQLite store kept current with incremental syncToken pulls.
+event_store = EventStore(os.environ.get("CALENDAR_STORE_PATH", shard_path("calendar_store.db")))
+# Admission control against the shared Google project quota; each shard gets its share of the project bucket.
+google_governor = open_governor("GOOGLE_API", user_rate=5, user_burst=10, project_rate=50, project_burst=100,
+                                project_share=SHARDS)
+# Sync pulls are charged per page they actually fetch; reads answered from the store cost nothing.
+calendar_sync = CalendarSync(event_store, governor=google_governor)
+# Conflict checks are answered from a local per-user index of busy blocks.
+busy_indexes = BusyIndexCache(loader=calendar_sync.load_window)
+# googleapiclient is synchronous; every call that can touch the network goes through the runner.
+runner = BlockingRunner(
+    max_workers=int(os.environ.get("CALENDAR_AGENT_WORKERS", "16")),
+    max_pending=int(os.environ.get("CALENDAR_AGENT_MAX_PENDING", "256")),
+)
+# Writes from the same user that land close together share one HTTP batch call.
+batch_writer = BatchWriter(runner=runner, governor=google_governor)
+
+def record_write(user_key, op, event_id, event):
+    if op == "delete":
+        calendar_sync.record_delete(user_key, event_id)
+        busy_indexes.record_delete(user_key, event_id)
+    else:
+        calendar_sync.record_upsert(user_key, event)
+        busy_indexes.record_upsert(user_key, event)
+
+async def outbox_service(user_key, session_token):
+    credentials = credential_store.resolve(session_token) if session_token else None
+    if credentials is None:
+        return None
+    return await runner.run(
+        user_key,
+        service_cache.get_service,
+        credentials["access_token"],
+        credentials["refresh_token"],
+        credentials["client_id"],
+        credentials["client_secret"],
+    )
+
+# Creates, updates and deletes are queued durably and retried with backoff on 429/5xx.
+outbox = WriteOutbox(
+    batch_writer,
+    os.environ.get("CALENDAR_OUTBOX_PATH", shard_path("calendar_outbox.db")),
+    service_for=outbox_service,
+    on_done=record_write,
+)
+# How long an intent waits for its writes before replying that they're queued.
+WRITE_REPLY_TIMEOUT = float(os.environ.get("CALENDAR_WRITE_WAIT", "10"))
+
+SLOT_SEARCH_DAYS = 7
+MAX_SLOTS = 10
+
+def intent_credentials(intent):
+    # Inline credentials are still accepted, e.g. from the benchmarks.
+    if intent.session_token:
+        return credential_store.resolve(intent.session_token)
+    return {field: getattr(intent, field) for field in CREDENTIAL_FIELDS}
+
+async def respond(ctx, sender, intent):
+    if intent.type == "prefetch":
+        # Nobody waits on a prefetch; if it failed, the conflict check just loads as it always did.
+        return
+    with span("respond"):
+        await ctx.send(sender, intent)
+        await push_result(ctx, intent)
+
+def event_body(title, start_time, end_time):
+    return {
+        "summary": title,
+        "start": {"dateTime": start_time, "timeZone": DEFAULT_TIME_ZONE},
+        "end": {"dateTime": end_time, "timeZone": DEFAULT_TIME_ZONE},
+    }
+
+# Follow-up pushes still waiting on their writes; the loop only holds weak references to tasks.
+follow_ups = set()
+
+def follow_up_done(ctx, task):
+    follow_ups.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        ctx.logger.error(f"Follow-up for settled writes failed: {task.exception()!r}")
+
+async def settle_writes(ctx, intent, futures, report):
+    # report(futures) builds the reply from whichever writes have finished. Writes still
+    # retrying when the wait runs out report again through a follow-up push once they settle.
+    with span("write"):
+        await asyncio.wait(futures, timeout=WRITE_REPLY_TIMEOUT)
+    if intent.request_id and not all(future.done() for future in futures):
+        async def follow_up():
+            await asyncio.wait(futures)
+            await push_result(ctx, intent.copy(update={
+                "message": report(futures), "status": None, "request_id": f"{intent.request_id}-settled",
+            }))
+        task = asyncio.ensure_future(follow_up())
+        follow_ups.add(task)
+        task.add_done_callback(lambda task: follow_up_done(ctx, task))
+    return report(futures)
+
+def write_outcome(future, describe):
+    if not future.done():
+        return "⏳ Google is rate-limiting writes right now; this one is queued and will go through automatically."
+    if future.exception() is not None:
+        return f"❌ Error: {future.exception()}"
+    return describe(future.result())
+
+def slot_models(slots):
+    return [TimeSlot(start_time=start.isoformat(), end_time=end.isoformat()) for start, end in slots]
+
+async def stream_events(ctx, user_key, service, intent):
+    # Pages are pulled one at a time and pushed to the UI as soon as they're formatted,
+    # so the first lines show up early and nothing holds the whole range in memory.
+    time_min, time_max, limit = read_range(intent.start_time, intent.end_time)
+    page_size = min(PAGE_SIZE, limit)
+    pages = await runner.run(user_key, calendar_sync.iter_window, user_key, service, time_min, time_max, page_size)
+    shown = 0
+    while shown < limit:
+        page = await runner.run(user_key, next, pages, None)
+        if page is None:
+            return shown, False
+        lines = [format_event(event) for event in page[:limit - shown]]
+        shown += len(lines)
+        await push_result(ctx, intent.copy(update={"message": "\n".join(lines), "more": True}))
+    return shown, True
+
 @calendar_protocol.on_message(model=CalendarIntent)
 async def handle_intent(ctx: Context, sender: str, intent: CalendarIntent):
+    # Spans are tagged with the UI's trace id; the replies carry it back.
+    trace = Trace(intent.trace_id, type=intent.type, status=intent.status or "new")
+    intent.trace_id = trace.trace_id
+    with activate(trace), profiled(intent.profile, f"calendar-{trace.trace_id}"):
+        await serve_intent(ctx, sender, intent)
+    metrics.observe("intent_seconds", trace.elapsed(), type=intent.type, status=trace.labels["status"])
+    ctx.logger.info(f"🧭 {trace.summary()}")
+
+async def serve_intent(ctx, sender, intent):
     try:
-        creds = Credentials(
-            token=intent.access_token,
-            refresh_token=intent.refresh_token,
-            token_uri="https://oauth2.googleapis.com/token",
-            client_id=intent.client_id,
-            client_secret=intent.client_secret,
-            scopes=["https://www.googleapis.com/auth/calendar"]
-        )
-        if creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-
-        service = build("calendar", "v3", credentials=creds)
-
-        if intent.type == "create_event" and intent.status != "confirmed":
-            start = intent.start_time
-            end = intent.end_time
-            events = service.events().list(
-                calendarId="primary",
-                timeMin=start,
-                timeMax=end,
-                singleEvents=True,
-                orderBy="startTime"
-            ).execute().get("items", [])
-
-            if events:
-                conflict_event = events[0]
-                intent.message = f"❌ Conflict: {conflict_event['summary']} already scheduled at this time."
+        with span("credentials"):
+            credentials = intent_credentials(intent)
+        if credentials is None:
+            intent.message = "🔐 Your session has expired. Please log in again."
+            await respond(ctx, sender, intent)
+            return
+        user_key = service_cache.cache_key(credentials["client_id"], credentials["refresh_token"])
+        if shard_ring.node_for(user_key) != SHARD:
+            # Still served correctly, just without this user's warm caches; usually a stale shard list in the UI.
+            ctx.logger.warning(f"Intent for a user owned by shard {shard_ring.node_for(user_key)} reached shard {SHARD}")
+        with span("service"):
+            service = await runner.run(
+                user_key,
+                service_cache.get_service,
+                credentials["access_token"],
+                credentials["refresh_token"],
+                credentials["client_id"],
+                credentials["client_secret"],
+            )
+        ctx.logger.debug(f"Service cache stats: {service_cache.stats}")
+        # Quota is charged where Google is actually called: writes per request by the batch writer,
+        # sync pulls per page by calendar_sync, freeBusy below. Answers from local state are free.
+
+        if intent.type == "prefetch":
+            # Sent by the UI while the LLM is still parsing a prompt, so the conflict check that follows finds
+            # this user's service and busy blocks warm. Skipped when the index is fresh enough already.
+            if busy_indexes.due(user_key, intent.start_time, intent.end_time):
+                with span("prefetch"):
+                    await runner.run(user_key, busy_indexes.resync, user_key, service)
+            return
+
+        elif intent.type == "create_event" and intent.status != "confirmed":
+            with span("conflicts"):
+                conflicts = await runner.run(user_key, busy_indexes.conflicts, user_key, service, intent.start_time, intent.end_time)
+
+            if conflicts:
+                titles = ", ".join(block.summary for block in conflicts)
+                intent.message = f"❌ Conflict: {titles} already scheduled at this time."
                 intent.status = "conflict"
+
+                # Offer alternatives from the same local busy data instead of another LLM/API round.
+                start, end = to_datetime(intent.start_time), to_datetime(intent.end_time)
+                search_end = start + datetime.timedelta(days=SLOT_SEARCH_DAYS)
+                nearby = await runner.run(user_key, busy_indexes.conflicts, user_key, service, start.isoformat(), search_end.isoformat())
+                slots = find_free_slots([(to_datetime(b.start), to_datetime(b.end)) for b in nearby], start, search_end, end - start)
+                if slots:
+                    intent.slots = slot_models(slots)
+                    intent.message += "\n💡 Free instead: " + "; ".join(format_slot(s, e) for s, e in slots)
             else:
                 intent.message = "✅ No conflict. Please confirm to book."
                 intent.status = "pending"
 
         elif intent.type == "create_event" and intent.status == "confirmed":
-            body = {
-                "summary": intent.title,
-                "start": {"dateTime": intent.start_time, "timeZone": "America/Los_Angeles"},
-                "end": {"dateTime": intent.end_time, "timeZone": "America/Los_Angeles"},
-            }
-            created = service.events().insert(calendarId="primary", body=body).execute()
-            intent.message = f"📅 Event created: {created.get('htmlLink')}"
+            body = event_body(intent.title, intent.start_time, intent.end_time)
+            # Same intent, same event id: a re-sent confirmation can't book the event twice.
+            event_id = client_event_id(user_key, intent.intent_id or uuid.uuid4().hex)
+            future = outbox.submit(user_key, intent.session_token, service, "insert", event_id, body, idempotency_key=event_id)
+            intent.message = await settle_writes(ctx, intent, [future], lambda futures: write_outcome(
+                futures[0], lambda created: f"📅 Event created: {created.get('htmlLink')}"))
+
+        elif intent.type == "create_events" and intent.status != "confirmed":
+            # Recurrences are expanded here and every occurrence is checked against one busy lookup.
+            items, truncated = expand_specs(intent.events or [])
+            with span("conflicts"):
+                conflicts = await runner.run(user_key, busy_indexes.conflicts_many, user_key, service, checkable_ranges(items))
+            mark_conflicts(items, conflicts)
+            intent.events = items
+            free = sum(item.status == "free" for item in items)
+            intent.status = "pending" if free else "conflict"
+            heading = f"✅ {free} of {len(items)} events are free. Please confirm to book them." if free else "❌ None of these events can be booked."
+            if truncated:
+                heading += f"\n⚠️ Only the first {MAX_BULK_EVENTS} occurrences were considered."
+            intent.message = summarize(items, heading)
+
+        elif intent.type == "create_events" and intent.status == "confirmed":
+            # Only the items that were free at check time are booked; the outbox drains them as batch calls.
+            items = [item for item in intent.events or [] if item.status == "free"]
+            batch_id = intent.intent_id or uuid.uuid4().hex
+            futures = []
+            for item in items:
+                item.event_id = client_event_id(user_key, batch_id, item.title, item.start_time)
+                body = event_body(item.title, item.start_time, item.end_time)
+                futures.append(outbox.submit(user_key, intent.session_token, service, "insert", item.event_id, body,
+                                             idempotency_key=item.event_id))
+
+            def report(futures):
+                for item, future in zip(items, futures):
+                    outcome = write_outcome(future, lambda created: f"📅 {item.title}: {created.get('htmlLink')}")
+                    item.status = "queued" if not future.done() else "failed" if future.exception() else "created"
+                    item.message = outcome if item.status == "created" else f"{item.title}: {outcome}"
+                intent.events = items
+                created = sum(item.status == "created" for item in items)
+                return summarize(items, f"📅 Created {created} of {len(items)} events.")
+
+            intent.message = await settle_writes(ctx, intent, futures, report)
 
         elif intent.type == "read_events":
-            now = datetime.datetime.utcnow().isoformat() + "Z"
-            events = service.events().list(calendarId='primary', timeMin=now, maxResults=5).execute().get('items', [])
-            intent.message = "\n".join([f"{e['summary']} at {e['start']['dateTime']}" for e in events])
+            with span("read"):
+                shown, truncated = await stream_events(ctx, user_key, service, intent)
+            if not shown:
+                intent.message = "📭 No events found."
+            else:
+                intent.message = f"📅 {shown} event{'s' if shown != 1 else ''}."
+                if truncated and intent.end_time:
+                    intent.message += " Showing the first ones only; narrow the range to see the rest."
 
         elif intent.type == "delete_event":
-            service.events().delete(calendarId='primary', eventId=intent.event_id).execute()
-            intent.message = "🗑️ Event deleted."
+            future = outbox.submit(user_key, intent.session_token, service, "delete", intent.event_id,
+                                   idempotency_key=f"delete:{intent.event_id}:{intent.intent_id or uuid.uuid4().hex}")
+            intent.message = await settle_writes(ctx, intent, [future], lambda futures: write_outcome(
+                futures[0], lambda _: "🗑️ Event deleted."))
 
         elif intent.type == "update_event":
-            body = {
-                "summary": intent.title,
-                "start": {"dateTime": intent.start_time, "timeZone": "America/Los_Angeles"},
-                "end": {"dateTime": intent.end_time, "timeZone": "America/Los_Angeles"},
-            }
-            updated = service.events().update(calendarId='primary', eventId=intent.event_id, body=body).execute()
-            intent.message = f"🔁 Event updated: {updated.get('htmlLink')}"
+            body = event_body(intent.title, intent.start_time, intent.end_time)
+            future = outbox.submit(user_key, intent.session_token, service, "update", intent.event_id, body,
+                                   idempotency_key=f"update:{intent.event_id}:{intent.intent_id or uuid.uuid4().hex}")
+            intent.message = await settle_writes(ctx, intent, [future], lambda futures: write_outcome(
+                futures[0], lambda updated: f"🔁 Event updated: {updated.get('htmlLink')}"))
+
+        elif intent.type == "find_slot":
+            now = datetime.datetime.now(datetime.timezone.utc)
+            range_start = max(to_datetime(intent.start_time), now) if intent.start_time else now
+            range_end = to_datetime(intent.end_time) if intent.end_time else range_start + datetime.timedelta(days=SLOT_SEARCH_DAYS)
+            duration = datetime.timedelta(minutes=intent.duration_minutes or 60)
+            hours = intent.work_hours or []
+            work_hours = tuple(hours) if len(hours) == 2 and 0 <= hours[0] < hours[1] <= 23 else (9, 17)
+            buffer = datetime.timedelta(minutes=max(0, intent.buffer_minutes or 0))
+            count = min(max(intent.slot_count or 3, 1), MAX_SLOTS)
+            calendars = ["primary", *(intent.attendees or [])]
+            with span("freebusy"):
+                await google_governor.acquire(user_key)
+                busy, errors = await runner.run(user_key, query_busy, service, calendars, range_start, range_end)
+            slots = find_free_slots(busy, range_start, range_end, duration, count=count, work_hours=work_hours, buffer=buffer)
+            intent.slots = slot_models(slots)
+            if slots:
+                intent.message = "🗓️ Free slots:\n" + "\n".join(f"- {format_slot(s, e)}" for s, e in slots)
+            else:
+                intent.message = f"❌ No free {int(duration.total_seconds() // 60)}-minute slot found in that range."
+            if errors:
+                unreadable = ", ".join(f"{calendar_id} ({reason})" for calendar_id, reason in errors.items())
+                intent.message += f"\n⚠️ Couldn't read availability for: {unreadable}"
+
+        elif intent.type == "sync_calendar":
+            with span("sync"):
+                await runner.run(user_key, calendar_sync.sync, user_key, service, force=True)
+                index = await runner.run(user_key, busy_indexes.resync, user_key, service)
+            intent.message = f"🔄 Calendar re-synced: {len(index)} busy blocks."
 
         else:
             intent.message = f"⚠️ Unknown intent type: {intent.type}"
 
-        await ctx.send(sender, intent)
+        await respond(ctx, sender, intent)
+
+    except AgentOverloaded:
+        intent.message = "⏳ The calendar agent is busy right now. Please try again in a moment."
+        await respond(ctx, sender, intent)
+
+    except RateLimited:
+        intent.message = "⏳ Google Calendar is rate limiting requests right now. Please try again in a moment."
+        await respond(ctx, sender, intent)
 
     except Exception as e:
         intent.message = f"❌ Error: {str(e)}"
-        await ctx.send(sender, intent)
+        await respond(ctx, sender, intent)
+
+@calendar_agent.on_event("startup")
+async def start_outbox(ctx: Context):
+    # Writes queued before a restart go out again without waiting for the user's next message.
+    outbox.start()
+    pending = outbox.pending_count()
+    if pending:
+        ctx.logger.info(f"📤 Resuming {pending} queued calendar writes")
+
+@calendar_agent.on_event("startup")
+async def serve_metrics(ctx: Context):
+    port = int(os.environ.get("CALENDAR_AGENT_METRICS_PORT", "9101")) + SHARD
+    metrics.gauge("runner", lambda: runner.stats)
+    metrics.gauge("service_cache", lambda: dict(service_cache.stats, size=len(service_cache)))
+    metrics.gauge("outbox", lambda: dict(outbox.stats, pending=outbox.pending_count()))
+    metrics.gauge("google_quota", google_governor.metrics)
+    metrics.serve(port=port)
+    ctx.logger.info(f"📈 Metrics on http://127.0.0.1:{port}/metrics")
+
+@calendar_agent.on_interval(period=60.0)
+async def log_quota(ctx: Context):
+    quota = google_governor.metrics()
+    if quota["granted"] or quota["rejected"]:
+        ctx.logger.info(f"📈 Google API quota: {quota}")
 
 calendar_agent.include(calendar_protocol)
 
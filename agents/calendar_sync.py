@@ -0,0 +1,97 @@
+import datetime
+import threading
+import time
+from collections import defaultdict
+
+from googleapiclient.errors import HttpError
+
+from agents.busy_index import EVENT_FIELDS, fetch_window, iter_pages, to_timestamp
+
+
+class CalendarSync:
+    """Keeps an EventStore in step with Google using one full pull, then nextSyncToken deltas."""
+
+    def __init__(self, store, lookback_days=30, min_interval=30, governor=None):
+        self.store = store
+        # Each page pulled from Google takes one read token for its user; local answers cost nothing.
+        self.governor = governor
+        self.lookback = datetime.timedelta(days=lookback_days)
+        self.min_interval = min_interval
+        self.stats = {"full_syncs": 0, "incremental_syncs": 0, "gone": 0}
+        self._locks = defaultdict(threading.Lock)
+
+    def _charge(self, user_key):
+        if self.governor is None:
+            return None
+        return lambda: self.governor.acquire_blocking(user_key)
+
+    def _pull(self, user_key, service, **params):
+        charge = self._charge(user_key)
+        items = []
+        page_token = None
+        while True:
+            if charge is not None:
+                charge()
+            response = service.events().list(
+                calendarId="primary",
+                singleEvents=True,
+                pageToken=page_token,
+                fields=f"nextPageToken,nextSyncToken,items({EVENT_FIELDS})",
+                **params,
+            ).execute()
+            items.extend(response.get("items", []))
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                return items, response.get("nextSyncToken")
+
+    def full_sync(self, user_key, service):
+        window_start = datetime.datetime.now(datetime.timezone.utc) - self.lookback
+        items, sync_token = self._pull(user_key, service, timeMin=window_start.isoformat())
+        self.store.replace_events(user_key, items, sync_token, window_start.timestamp(), time.time())
+        self.stats["full_syncs"] += 1
+
+    def sync(self, user_key, service, force=False):
+        with self._locks[user_key]:
+            state = self.store.get_sync_state(user_key)
+            if force or state is None or state[0] is None:
+                return self.full_sync(user_key, service)
+            sync_token, window_start, synced_at = state
+            if time.time() - synced_at < self.min_interval:
+                return
+            try:
+                items, next_token = self._pull(user_key, service, syncToken=sync_token)
+            except HttpError as e:
+                if e.resp.status != 410:
+                    raise
+                # Token expired or invalidated by Google: start over.
+                self.stats["gone"] += 1
+                return self.full_sync(user_key, service)
+            self.store.upsert_events(user_key, items)
+            self.store.set_sync_state(user_key, next_token, window_start, time.time())
+            self.stats["incremental_syncs"] += 1
+
+    def load_window(self, user_key, service, time_min, time_max):
+        self.sync(user_key, service)
+        start, end = to_timestamp(time_min), to_timestamp(time_max)
+        state = self.store.get_sync_state(user_key)
+        if state is None or start < state[1]:
+            # Older than anything we pulled; the store can't answer this one.
+            return fetch_window(service, time_min, time_max, charge=self._charge(user_key))
+        return self.store.events_between(user_key, start, end)
+
+    def iter_window(self, user_key, service, time_min, time_max=None, page_size=50):
+        # Same source choice as load_window, but handed out a page at a time.
+        self.sync(user_key, service)
+        start = to_timestamp(time_min)
+        end = to_timestamp(time_max) if time_max else float("inf")
+        state = self.store.get_sync_state(user_key)
+        if state is None or start < state[1]:
+            params = {"timeMin": time_min, **({"timeMax": time_max} if time_max else {})}
+            return iter_pages(service, first_page_size=page_size, charge=self._charge(user_key), **params)
+        return self.store.iter_between(user_key, start, end, page_size=page_size)
+
+    def record_upsert(self, user_key, event):
+        self.store.upsert_events(user_key, [event])
+
+    def record_delete(self, user_key, event_id):
+        self.store.delete_event(user_key, event_id)
@@ -0,0 +1,92 @@
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+DEFAULT_TTL = 12 * 60 * 60
+CREDENTIAL_FIELDS = ("access_token", "refresh_token", "client_id", "client_secret")
+
+
+def new_session_token():
+    return secrets.token_urlsafe(16)
+
+
+class MemoryCredentialStore:
+    """Opaque session token -> OAuth credentials, so intents carry a handle instead of secrets (single process)."""
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def register(self, credentials, ttl=None):
+        token = new_session_token()
+        with self._lock:
+            self._entries[token] = (dict(credentials), time.time() + (ttl or self.ttl))
+        return token
+
+    def resolve(self, token):
+        with self._lock:
+            credentials, expires_at = self._entries.get(token, (None, 0))
+            if credentials is not None and expires_at <= time.time():
+                del self._entries[token]
+                return None
+        return dict(credentials) if credentials else None
+
+    def revoke(self, token):
+        with self._lock:
+            self._entries.pop(token, None)
+
+
+class SQLiteCredentialStore:
+    """Same interface as MemoryCredentialStore, shared between the UI and calendar agent processes."""
+
+    def __init__(self, path="credentials.db", ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        # Refresh tokens live here, so the file is created readable by its owner only.
+        if not os.path.exists(path):
+            os.close(os.open(path, os.O_CREAT | os.O_WRONLY, 0o600))
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS credentials (
+                    token TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+
+    def register(self, credentials, ttl=None):
+        token = new_session_token()
+        with self._lock:
+            self._conn.execute("DELETE FROM credentials WHERE expires_at <= ?", (time.time(),))
+            self._conn.execute(
+                "INSERT INTO credentials VALUES (?, ?, ?)",
+                (token, json.dumps(credentials), time.time() + (ttl or self.ttl)),
+            )
+        return token
+
+    def resolve(self, token):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM credentials WHERE token = ? AND expires_at > ?", (token, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def revoke(self, token):
+        with self._lock:
+            self._conn.execute("DELETE FROM credentials WHERE token = ?", (token,))
+
+
+def open_credential_store(location=None):
+    # Same convention as open_pending_store: "memory" or a SQLite path both processes can open.
+    location = location or os.environ.get("CREDENTIAL_STORE", "credentials.db")
+    if location == "memory":
+        return MemoryCredentialStore()
+    return SQLiteCredentialStore(location)
@@ -0,0 +1,30 @@
+import datetime
+from zoneinfo import ZoneInfo
+
+from agents.slot_finder import DEFAULT_TIME_ZONE, format_slot, to_datetime
+
+# read_events without a range lists the next few events; with a range, everything in it up to a cap.
+UPCOMING_LIMIT = 5
+RANGE_LIMIT = 500
+PAGE_SIZE = 50
+
+
+def format_event(event, time_zone=DEFAULT_TIME_ZONE):
+    title = event.get("summary", "(no title)")
+    start, end = event.get("start", {}), event.get("end", {})
+    if "dateTime" not in start:
+        # All-day events only carry dates, and the end date is exclusive.
+        first = datetime.date.fromisoformat(start["date"])
+        last = datetime.date.fromisoformat(end["date"]) - datetime.timedelta(days=1) if "date" in end else first
+        days = first.strftime("%A, %B %d") + (f" – {last.strftime('%A, %B %d')}" if last > first else "")
+        return f"- {title}: {days} (all day)"
+    return f"- {title}: {format_slot(to_datetime(start['dateTime']), to_datetime(end['dateTime']), time_zone)}"
+
+
+def read_range(start_time, end_time, time_zone=DEFAULT_TIME_ZONE):
+    # Returns (time_min, time_max, limit); time_max is None for "what's next".
+    now = datetime.datetime.now(ZoneInfo(time_zone))
+    time_min = to_datetime(start_time) if start_time else now
+    if end_time:
+        return time_min.isoformat(), to_datetime(end_time).isoformat(), RANGE_LIMIT
+    return time_min.isoformat(), None, UPCOMING_LIMIT
@@ -0,0 +1,125 @@
+import json
+import sqlite3
+import threading
+
+from agents.busy_index import to_timestamp
+
+
+class EventStore:
+    """SQLite-backed copy of each user's events plus their Calendar sync state."""
+
+    def __init__(self, path="calendar_store.db"):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS events (
+                    user_key TEXT NOT NULL,
+                    event_id TEXT NOT NULL,
+                    start_ts REAL NOT NULL,
+                    end_ts REAL NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (user_key, event_id)
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS events_by_start ON events (user_key, start_ts)")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    user_key TEXT PRIMARY KEY,
+                    sync_token TEXT,
+                    window_start REAL,
+                    synced_at REAL
+                )
+                """
+            )
+
+    @staticmethod
+    def _rows(user_key, events):
+        rows = []
+        deleted = []
+        for event in events:
+            if event.get("status") == "cancelled" or "start" not in event:
+                deleted.append((user_key, event["id"]))
+                continue
+            rows.append((
+                user_key,
+                event["id"],
+                to_timestamp(event["start"]),
+                to_timestamp(event["end"]),
+                json.dumps(event),
+            ))
+        return rows, deleted
+
+    def replace_events(self, user_key, events, sync_token, window_start, synced_at):
+        rows, _ = self._rows(user_key, events)
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM events WHERE user_key = ?", (user_key,))
+            self._conn.executemany("INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)",
+                (user_key, sync_token, window_start, synced_at),
+            )
+
+    def upsert_events(self, user_key, events):
+        rows, deleted = self._rows(user_key, events)
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.executemany("DELETE FROM events WHERE user_key = ? AND event_id = ?", deleted)
+
+    def delete_event(self, user_key, event_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM events WHERE user_key = ? AND event_id = ?", (user_key, event_id))
+
+    def events_between(self, user_key, start_ts, end_ts, limit=None):
+        query = "SELECT data FROM events WHERE user_key = ? AND end_ts > ? AND start_ts < ? ORDER BY start_ts"
+        params = [user_key, start_ts, end_ts]
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def iter_between(self, user_key, start_ts, end_ts, page_size=100):
+        # Keyset pagination on (start_ts, event_id): no cursor or lock is held between pages.
+        after_ts, after_id = float("-inf"), ""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT start_ts, event_id, data FROM events WHERE user_key = ? AND end_ts > ? AND start_ts < ? "
+                    "AND (start_ts > ? OR (start_ts = ? AND event_id > ?)) ORDER BY start_ts, event_id LIMIT ?",
+                    (user_key, start_ts, end_ts, after_ts, after_ts, after_id, page_size),
+                ).fetchall()
+            if rows:
+                yield [json.loads(data) for _, _, data in rows]
+            if len(rows) < page_size:
+                return
+            after_ts, after_id = rows[-1][0], rows[-1][1]
+
+    def get_sync_state(self, user_key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sync_token, window_start, synced_at FROM sync_state WHERE user_key = ?", (user_key,)
+            ).fetchone()
+        return row
+
+    def set_sync_state(self, user_key, sync_token, window_start, synced_at):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)",
+                (user_key, sync_token, window_start, synced_at),
+            )
+
+    def reset_user(self, user_key):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM events WHERE user_key = ?", (user_key,))
+            self._conn.execute("DELETE FROM sync_state WHERE user_key = ?", (user_key,))
+
+    def close(self):
+        self._conn.close()
@@ -1,7 +1,9 @@
+import os
+
 from uagents import Agent, Context, Protocol
 from models.calendar_intent import CalendarIntent
-import requests
-import json
+from agents.pending_store import open_pending_store, hold_for_confirmation
+from agents.telemetry import Trace, activate, metrics, span
 
 frontend_agent = Agent(
     name="frontend_agent",
@@ -12,16 +14,27 @@ frontend_agent = Agent(
 
 frontend_protocol = Protocol("calendar_protocol")
 
+# Shared with streamlit_ui.py (same PENDING_STORE location) so each session sees only its own intents.
+pending_store = open_pending_store()
+
 @frontend_protocol.on_message(model=CalendarIntent)
 async def display_response(ctx: Context, sender: str, intent: CalendarIntent):
-    ctx.logger.info(f"📩 Response: {intent.message}")
-    if intent.status == "pending":
-        ctx.logger.info("⏳ Awaiting user confirmation...")
-        confirm_intent = intent.copy()
-        confirm_intent.status = "confirmed"
-        # Save for UI confirmation button
-        with open("pending_intent.json", "w") as f:
-            json.dump(confirm_intent.dict(), f)
+    trace = Trace(intent.trace_id, agent="frontend", type=intent.type)
+    with activate(trace):
+        ctx.logger.info(f"📩 Response: {intent.message}")
+        if intent.status == "pending":
+            ctx.logger.info("⏳ Awaiting user confirmation...")
+            # Save for UI confirmation button
+            with span("hold"):
+                hold_for_confirmation(pending_store, intent.dict())
+    metrics.observe("intent_seconds", trace.elapsed(), type=intent.type, status=intent.status or "none")
+    ctx.logger.debug(f"🧭 {trace.summary()}")
+
+@frontend_agent.on_event("startup")
+async def serve_metrics(ctx: Context):
+    port = int(os.environ.get("FRONTEND_AGENT_METRICS_PORT", "9100"))
+    metrics.serve(port=port)
+    ctx.logger.info(f"📈 Metrics on http://127.0.0.1:{port}/metrics")
 
 frontend_agent.include(frontend_protocol)
 
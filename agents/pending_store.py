@@ -0,0 +1,121 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from models.envelope import SECRET_FIELDS, pack, unpack
+
+DEFAULT_TTL = 15 * 60
+
+
+class MemoryPendingStore:
+    """Pending intents awaiting confirmation, keyed by session then intent id (single process)."""
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def put(self, session_id, intent_id, data, ttl=None):
+        expires_at = time.time() + (ttl or self.ttl)
+        with self._lock:
+            self._sessions.setdefault(session_id, {})[intent_id] = (data, expires_at)
+
+    def get(self, session_id):
+        now = time.time()
+        with self._lock:
+            pending = self._sessions.get(session_id, {})
+            for intent_id in [i for i, (_, expires_at) in pending.items() if expires_at <= now]:
+                del pending[intent_id]
+            return {intent_id: data for intent_id, (data, _) in pending.items()}
+
+    def claim(self, session_id, intent_id):
+        # Remove-and-return under one lock, so a double-clicked confirm books at most once.
+        with self._lock:
+            data, expires_at = self._sessions.get(session_id, {}).pop(intent_id, (None, 0))
+        return data if expires_at > time.time() else None
+
+    def discard(self, session_id, intent_id):
+        self.claim(session_id, intent_id)
+
+
+class SQLitePendingStore:
+    """Same interface as MemoryPendingStore, shared between the agent and UI processes."""
+
+    def __init__(self, path="pending_intents.db", ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS pending_intents (
+                    session_id TEXT NOT NULL,
+                    intent_id TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (session_id, intent_id)
+                )
+                """
+            )
+
+    def put(self, session_id, intent_id, data, ttl=None):
+        expires_at = time.time() + (ttl or self.ttl)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pending_intents VALUES (?, ?, ?, ?)",
+                (session_id, intent_id, pack(data).decode(), expires_at),
+            )
+
+    def get(self, session_id):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM pending_intents WHERE session_id = ? AND expires_at <= ?", (session_id, time.time())
+            )
+            rows = self._conn.execute(
+                "SELECT intent_id, data FROM pending_intents WHERE session_id = ?", (session_id,)
+            ).fetchall()
+        return {intent_id: unpack(data) for intent_id, data in rows}
+
+    def claim(self, session_id, intent_id):
+        # BEGIN IMMEDIATE takes the write lock up front, so only one process can win the row.
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT data, expires_at FROM pending_intents WHERE session_id = ? AND intent_id = ?",
+                    (session_id, intent_id),
+                ).fetchone()
+                self._conn.execute(
+                    "DELETE FROM pending_intents WHERE session_id = ? AND intent_id = ?", (session_id, intent_id)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None or row[1] <= time.time():
+            return None
+        return unpack(row[0])
+
+    def discard(self, session_id, intent_id):
+        self.claim(session_id, intent_id)
+
+
+def hold_for_confirmation(store, intent_data):
+    # What gets stored is the intent as it should be re-sent once the user clicks confirm,
+    # minus credentials: the UI attaches its own session token when it re-sends.
+    data = {k: v for k, v in intent_data.items() if k not in SECRET_FIELDS}
+    data["status"] = "confirmed"
+    data["intent_id"] = data.get("intent_id") or uuid.uuid4().hex
+    store.put(data.get("session_id") or "default", data["intent_id"], data)
+    return data["intent_id"]
+
+
+def open_pending_store(location=None):
+    # "memory" keeps everything in-process; anything else is a SQLite path both processes can open.
+    location = location or os.environ.get("PENDING_STORE", "pending_intents.db")
+    if location == "memory":
+        return MemoryPendingStore()
+    return SQLitePendingStore(location)
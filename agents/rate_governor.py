@@ -0,0 +1,178 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+
+
+class RateLimited(Exception):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        # Seconds until the quota would have had room for the call.
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Refills at `rate` tokens per second up to `burst`. Costs above the burst are taken as debt."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.last_used = self.updated
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, cost, floor=0.0):
+        # Seconds until `cost` tokens can be taken without going below `floor`.
+        needed = min(cost, self.burst - floor) + floor - self.tokens
+        return max(0.0, needed / self.rate)
+
+    def take(self, cost, now):
+        self.tokens -= cost
+        self.last_used = now
+
+
+class RateGovernor:
+    """Token-bucket admission control for one upstream API: a bucket per user and one for the whole project.
+
+    Callers queue (sleep) until both buckets have room instead of failing straight away; a call
+    that would have to wait longer than `max_wait` is rejected with RateLimited. Reads may not
+    take the project bucket below `write_reserve` of its burst, so confirms and writes still get
+    through while reads are throttled.
+    """
+
+    def __init__(self, name, user_rate, user_burst, project_rate, project_burst,
+                 write_reserve=0.2, max_wait=10.0, idle_ttl=600.0):
+        self.name = name
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.write_reserve = write_reserve * project_burst
+        self.max_wait = max_wait
+        self.idle_ttl = idle_ttl
+        self.project = TokenBucket(project_rate, project_burst)
+        self.stats = {"granted": 0, "granted_writes": 0, "queued": 0, "rejected": 0, "waiting": 0}
+        self._users = {}
+        self._waits = deque(maxlen=1000)
+        self._lock = threading.Lock()
+
+    def _user_bucket(self, user, now):
+        bucket = self._users.get(user)
+        if bucket is None:
+            if len(self._users) > 1000:
+                # Idle users are back at a full bucket anyway, so dropping them changes nothing.
+                for key in [key for key, b in self._users.items() if now - b.last_used > self.idle_ttl]:
+                    del self._users[key]
+            bucket = self._users[user] = TokenBucket(self.user_rate, self.user_burst)
+        return bucket
+
+    def _reserve(self, user, cost):
+        """Books `cost` from the user's bucket and returns how long to wait for it; raises RateLimited if that's over max_wait."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._user_bucket(user, now)
+            bucket.refill(now)
+            # Each user's calls queue in order behind the debt the earlier ones left, so a flood is turned
+            # away up front instead of every queued call polling until it times out.
+            delay = bucket.delay(cost)
+            if delay > self.max_wait:
+                self.stats["rejected"] += 1
+                raise RateLimited(f"{self.name} quota for this user exhausted", retry_after=delay)
+            bucket.take(cost, now)
+            return delay
+
+    def _try_project(self, cost, write):
+        """Takes from the project bucket and returns 0, or returns the seconds to wait before trying again."""
+        now = time.monotonic()
+        with self._lock:
+            self.project.refill(now)
+            floor = 0.0 if write else self.write_reserve
+            delay = self.project.delay(cost, floor)
+            if delay == 0:
+                self.project.take(cost, now)
+        return delay
+
+    def _refund(self, user, cost):
+        with self._lock:
+            bucket = self._users.get(user)
+            if bucket is not None:
+                bucket.tokens = min(bucket.burst, bucket.tokens + cost)
+
+    def _admit(self, user, cost, write):
+        # Shared by the async and blocking paths: yields delays to sleep for until the call is admitted.
+        started = time.monotonic()
+        delay = self._reserve(user, cost)
+        queued = False
+        with self._lock:
+            self.stats["waiting"] += 1
+        try:
+            while True:
+                if delay:
+                    if not queued:
+                        queued = True
+                        with self._lock:
+                            self.stats["queued"] += 1
+                    yield delay
+                delay = self._try_project(cost, write)
+                if not delay:
+                    break
+                if time.monotonic() - started + delay > self.max_wait:
+                    self._refund(user, cost)
+                    with self._lock:
+                        self.stats["rejected"] += 1
+                    raise RateLimited(f"{self.name} project quota exhausted; retry in {delay:.1f}s", retry_after=delay)
+        finally:
+            with self._lock:
+                self.stats["waiting"] -= 1
+        with self._lock:
+            self.stats["granted"] += 1
+            self.stats["granted_writes"] += write
+            self._waits.append(time.monotonic() - started)
+
+    async def acquire(self, user, cost=1, write=False):
+        for delay in self._admit(user, cost, write):
+            await asyncio.sleep(delay)
+
+    def acquire_blocking(self, user, cost=1, write=False):
+        for delay in self._admit(user, cost, write):
+            time.sleep(delay)
+
+    def metrics(self):
+        now = time.monotonic()
+        with self._lock:
+            self.project.refill(now)
+            waits = sorted(self._waits)
+            metrics = dict(self.stats, project_tokens=round(self.project.tokens, 2), users=len(self._users))
+        if waits:
+            metrics["wait_p50_ms"] = round(waits[len(waits) // 2] * 1000, 1)
+            metrics["wait_p99_ms"] = round(waits[min(len(waits) - 1, int(len(waits) * 0.99))] * 1000, 1)
+            metrics["wait_max_ms"] = round(waits[-1] * 1000, 1)
+        return metrics
+
+    def user_tokens(self, user):
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._users.get(user)
+            if bucket is None:
+                return float(self.user_burst)
+            bucket.refill(now)
+            return bucket.tokens
+
+
+def open_governor(prefix, user_rate, user_burst, project_rate, project_burst, project_share=1):
+    """Builds a governor from `<prefix>_USER_RATE`, `_USER_BURST`, `_PROJECT_RATE`, `_PROJECT_BURST` and `_MAX_WAIT`.
+
+    `project_share` splits the project quota between processes that each hold one governor (calendar agent shards).
+    """
+    env = lambda name, default: float(os.environ.get(f"{prefix}_{name}", default))
+    return RateGovernor(
+        prefix.lower(),
+        user_rate=env("USER_RATE", user_rate),
+        user_burst=env("USER_BURST", user_burst),
+        project_rate=env("PROJECT_RATE", project_rate) / project_share,
+        project_burst=max(1.0, env("PROJECT_BURST", project_burst) / project_share),
+        max_wait=env("MAX_WAIT", 10.0),
+    )
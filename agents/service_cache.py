@@ -0,0 +1,103 @@
+import datetime
+import threading
+import time
+from collections import OrderedDict
+
+from google.oauth2.credentials import Credentials
+from google.auth.transport.requests import Request
+from googleapiclient.discovery import build
+
+from agents.shard_ring import user_key
+from agents.telemetry import timed
+
+TOKEN_URI = "https://oauth2.googleapis.com/token"
+SCOPES = ["https://www.googleapis.com/auth/calendar"]
+
+
+def build_calendar_service(creds, **kwargs):
+    return build("calendar", "v3", credentials=creds, cache_discovery=False, **kwargs)
+
+
+class _CachedService:
+    def __init__(self, creds, service, created_at):
+        self.creds = creds
+        self.service = service
+        self.created_at = created_at
+        self.lock = threading.Lock()
+
+
+class ServiceCache:
+    """LRU cache of authorized Calendar services keyed by client_id + refresh token hash."""
+
+    def __init__(self, max_size=256, ttl=3600, refresh_margin=300, build_fn=build_calendar_service):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.refresh_margin = datetime.timedelta(seconds=refresh_margin)
+        self.build_fn = build_fn
+        self.stats = {"hits": 0, "misses": 0, "refreshes": 0, "evictions": 0}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(client_id, refresh_token):
+        return user_key(client_id, refresh_token)
+
+    def get_service(self, access_token, refresh_token, client_id, client_secret):
+        key = self.cache_key(client_id, refresh_token)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.created_at > self.ttl:
+                del self._entries[key]
+                self.stats["evictions"] += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+            else:
+                self.stats["misses"] += 1
+
+        if entry is None:
+            creds = Credentials(
+                token=access_token,
+                refresh_token=refresh_token,
+                token_uri=TOKEN_URI,
+                client_id=client_id,
+                client_secret=client_secret,
+                scopes=SCOPES,
+            )
+            with timed("google_call_seconds", call="discovery_build"):
+                service = self.build_fn(creds)
+            entry = _CachedService(creds, service, now)
+            with self._lock:
+                self._entries[key] = entry
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.stats["evictions"] += 1
+
+        self._ensure_fresh(entry)
+        return entry.service
+
+    def _ensure_fresh(self, entry):
+        # Refresh ahead of expiry so in-flight API calls never hit a 401 + retry.
+        with entry.lock:
+            creds = entry.creds
+            if not creds.refresh_token:
+                return
+            expiring = creds.expiry is not None and creds.expiry - datetime.datetime.utcnow() < self.refresh_margin
+            if creds.token is None or expiring:
+                with timed("google_call_seconds", call="oauth_refresh"):
+                    creds.refresh(Request())
+                with self._lock:
+                    self.stats["refreshes"] += 1
+
+    def invalidate(self, client_id, refresh_token):
+        with self._lock:
+            self._entries.pop(self.cache_key(client_id, refresh_token), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
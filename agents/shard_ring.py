@@ -0,0 +1,35 @@
+import bisect
+import hashlib
+import os
+
+
+def user_key(client_id, refresh_token):
+    # One key per Google account, used both for per-user caches and for picking a shard.
+    digest = hashlib.sha256((refresh_token or "").encode()).hexdigest()
+    return f"{client_id}:{digest}"
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent-hash ring: each node owns many small arcs, so adding a shard moves about 1/N of users."""
+
+    def __init__(self, nodes, replicas=128):
+        self.nodes = list(nodes)
+        points = sorted((_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(replicas))
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key):
+        i = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._nodes[i]
+
+
+def shard_urls():
+    # CALENDAR_AGENT_URLS lists every shard's submit URL in shard order; otherwise there's a single agent.
+    urls = os.environ.get("CALENDAR_AGENT_URLS")
+    if urls:
+        return [url.strip() for url in urls.split(",") if url.strip()]
+    return [os.environ.get("CALENDAR_AGENT_URL", "http://localhost:8001/submit")]
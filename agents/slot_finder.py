@@ -0,0 +1,90 @@
+import datetime
+from zoneinfo import ZoneInfo
+
+from agents.busy_index import DEFAULT_TIME_ZONE, to_timestamp
+
+
+def to_datetime(value):
+    # Busy-index timestamps, ISO strings and Calendar API time objects all become aware UTC datetimes.
+    ts = value if isinstance(value, (int, float)) else to_timestamp(value)
+    return datetime.datetime.fromtimestamp(ts, datetime.timezone.utc)
+
+
+def merge_busy(intervals):
+    """Sweep (start, end) pairs in start order and fold overlapping or touching ones together."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _round_up(dt, minutes):
+    step = minutes * 60
+    remainder = dt.timestamp() % step
+    return dt if remainder == 0 else dt + datetime.timedelta(seconds=step - remainder)
+
+
+def find_free_slots(
+    busy,
+    range_start,
+    range_end,
+    duration,
+    count=3,
+    work_hours=(9, 17),
+    buffer=datetime.timedelta(0),
+    time_zone=DEFAULT_TIME_ZONE,
+    weekdays_only=True,
+    granularity=15,
+):
+    """Earliest `count` free windows of `duration` inside working hours, `buffer` away from anything busy."""
+    tz = ZoneInfo(time_zone)
+    busy = merge_busy([(start - buffer, end + buffer) for start, end in busy])
+    slots = []
+    i = 0
+    day = range_start.astimezone(tz).date()
+    last_day = range_end.astimezone(tz).date()
+    while day <= last_day and len(slots) < count:
+        if not (weekdays_only and day.weekday() >= 5):
+            cursor = max(range_start, datetime.datetime.combine(day, datetime.time(work_hours[0]), tz))
+            day_end = min(range_end, datetime.datetime.combine(day, datetime.time(work_hours[1]), tz))
+            while len(slots) < count:
+                cursor = _round_up(cursor, granularity)
+                while i < len(busy) and busy[i][1] <= cursor:
+                    i += 1
+                if cursor + duration > day_end:
+                    break
+                if i < len(busy) and busy[i][0] < cursor + duration:
+                    cursor = busy[i][1]
+                    continue
+                slots.append((cursor, cursor + duration))
+                cursor += duration
+        day += datetime.timedelta(days=1)
+    return slots
+
+
+def query_busy(service, calendar_ids, range_start, range_end):
+    """One freeBusy.query for every calendar; returns (busy intervals, {calendar_id: error reason})."""
+    response = service.freebusy().query(body={
+        "timeMin": range_start.isoformat(),
+        "timeMax": range_end.isoformat(),
+        "items": [{"id": calendar_id} for calendar_id in calendar_ids],
+    }).execute()
+    busy = []
+    errors = {}
+    for calendar_id, calendar in response.get("calendars", {}).items():
+        if calendar.get("errors"):
+            errors[calendar_id] = calendar["errors"][0].get("reason", "unknown")
+            continue
+        for block in calendar.get("busy", []):
+            busy.append((to_datetime(block["start"]), to_datetime(block["end"])))
+    return busy, errors
+
+
+def format_slot(start, end, time_zone=DEFAULT_TIME_ZONE):
+    tz = ZoneInfo(time_zone)
+    start, end = start.astimezone(tz), end.astimezone(tz)
+    return f"{start.strftime('%A, %B %d')} {start.strftime('%I:%M %p')} – {end.strftime('%I:%M %p')}"
@@ -0,0 +1,223 @@
+import contextlib
+import contextvars
+import cProfile
+import io
+import logging
+import os
+import pstats
+import threading
+import time
+import uuid
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, from a local SQLite read up to a slow LLM call.
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+
+
+def _labels(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+
+class Registry:
+    """Process-wide histograms, counters and gauges, rendered in the Prometheus text format."""
+
+    def __init__(self, prefix="calendar_assistant"):
+        self.prefix = prefix
+        self._histograms = defaultdict(lambda: [[0] * len(BUCKETS), 0.0, 0])
+        self._counters = defaultdict(float)
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds, **labels):
+        with self._lock:
+            histogram = self._histograms[(name, _labels(labels))]
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            self._counters[(name, _labels(labels))] += value
+
+    def gauge(self, name, fn):
+        # fn returns a number or a dict of numbers (one gauge per key); other values are skipped.
+        self._gauges[name] = fn
+
+    def render(self):
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        seen = set()
+        for (name, labels), (buckets, total, count) in histograms:
+            metric = f"{self.prefix}_{name}"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            for bound, n in zip(BUCKETS, buckets):
+                lines.append(f"{metric}_bucket{_format_labels(labels, [('le', bound)])} {n}")
+            lines.append(f"{metric}_bucket{_format_labels(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {total:.6f}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {count}")
+        for (name, labels), value in counters:
+            metric = f"{self.prefix}_{name}_total"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_format_labels(labels)} {value:g}")
+        for name, fn in sorted(self._gauges.items()):
+            try:
+                values = fn()
+            except Exception:
+                logger.exception(f"Gauge {name} failed")
+                continue
+            if not isinstance(values, dict):
+                values = {"": values}
+            for key, value in values.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                metric = f"{self.prefix}_{name}_{key}" if key else f"{self.prefix}_{name}"
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def handle_get(self, handler):
+        # GET handler for any BaseHTTPRequestHandler that wants to expose /metrics.
+        if handler.path.split("?")[0] != "/metrics":
+            handler.send_response(404)
+            handler.send_header("Content-Length", "0")
+            handler.end_headers()
+            return
+        body = self.render().encode()
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/plain; version=0.0.4")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def serve(self, host="127.0.0.1", port=9100):
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                registry.handle_get(self)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+metrics = Registry()
+
+
+class Trace:
+    """Timed stages of one request, all tagged with the trace id the intent carries between UI and agents."""
+
+    def __init__(self, trace_id=None, **labels):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.labels = labels
+        self.started = time.perf_counter()
+        self.spans = []
+
+    @contextlib.contextmanager
+    def span(self, stage, **labels):
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            yield
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.observe("stage_seconds", elapsed, stage=stage, outcome=outcome, **labels)
+            self.spans.append((stage, elapsed))
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def summary(self):
+        # logfmt, so log lines from the UI and every agent can be joined on trace_id.
+        fields = [f"trace_id={self.trace_id}"] + [f"{key}={value}" for key, value in self.labels.items()]
+        fields.append(f"total_ms={self.elapsed() * 1000:.1f}")
+        fields += [f"{stage}_ms={elapsed * 1000:.1f}" for stage, elapsed in self.spans]
+        return " ".join(fields)
+
+
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+@contextlib.contextmanager
+def activate(trace):
+    token = current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        current_trace.reset(token)
+
+
+@contextlib.contextmanager
+def span(stage, **labels):
+    """A stage of the current trace, or just a histogram sample when no trace is active."""
+    trace = current_trace.get() or Trace()
+    with trace.span(stage, **labels):
+        yield
+
+
+@contextlib.contextmanager
+def timed(name, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe(name, time.perf_counter() - started, **labels)
+
+
+# cProfile hooks the interpreter's one profiler slot, so two overlapping profiles would replace each other.
+_profiling = threading.Lock()
+
+
+@contextlib.contextmanager
+def profiled(enabled, name):
+    """cProfile the block when enabled; dumps `<PROFILE_DIR>/<name>.prof` and logs the top functions.
+
+    Only the calling thread is profiled, and in async code other tasks that run between awaits show up too.
+    One block is profiled at a time; a block that starts while another is being profiled runs unprofiled.
+    """
+    if not enabled:
+        yield None
+        return
+    if not _profiling.acquire(blocking=False):
+        logger.warning(f"Not profiling {name}: another profile is already running")
+        yield None
+        return
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield profile
+    finally:
+        profile.disable()
+        _profiling.release()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{name}.prof")
+        profile.dump_stats(path)
+        top = io.StringIO()
+        pstats.Stats(profile, stream=top).sort_stats("cumulative").print_stats(15)
+        logger.info(f"Profile written to {path}\n{top.getvalue()}")
@@ -0,0 +1,344 @@
+import asyncio
+import base64
+import datetime
+import email.utils
+import hashlib
+import json
+import logging
+import math
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from googleapiclient.errors import HttpError
+
+from agents.rate_governor import RateLimited
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+DONE_RETENTION = 24 * 60 * 60
+
+
+class WriteFailed(Exception):
+    pass
+
+
+def client_event_id(*parts):
+    # Calendar accepts client-chosen ids in base32hex (a-v, 0-9); the same parts always give the same id,
+    # so a retried insert can't create a second copy of the event.
+    digest = hashlib.sha256(":".join(str(part) for part in parts).encode()).digest()
+    return base64.b32hexencode(digest).decode().rstrip("=").lower()[:32]
+
+
+def retry_delay(attempt, retry_after=None, base=0.5, cap=60.0):
+    # Full jitter, but never sooner than the server asked for.
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    return max(delay, retry_after or 0)
+
+
+def parse_retry_after(value):
+    """Seconds from now for a Retry-After header, in either delay-seconds or HTTP-date form; None if unusable."""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            when = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=datetime.timezone.utc)
+        seconds = (when - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+    return seconds if math.isfinite(seconds) and seconds >= 0 else None
+
+
+def error_reason(exc):
+    try:
+        return json.loads(exc.content)["error"]["errors"][0]["reason"]
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+
+
+def classify(exc, op):
+    """Returns ("done" | "duplicate" | "throttled" | "retry" | "fail", retry_after) for a failed write."""
+    if isinstance(exc, RateLimited):
+        # Turned away by our own governor, so it never reached Google.
+        return "throttled", exc.retry_after
+    if not isinstance(exc, HttpError):
+        # Connection resets, timeouts, an overloaded runner: nothing reached Google or we can't tell.
+        return "retry", None
+    status = exc.resp.status
+    retry_after = parse_retry_after(exc.resp.get("retry-after"))
+    if op == "insert" and status == 409:
+        return "duplicate", None
+    if op == "delete" and status in (404, 410):
+        return "done", None
+    if status in RETRY_STATUSES or (status == 403 and error_reason(exc) in RATE_LIMIT_REASONS):
+        return "retry", retry_after
+    return "fail", None
+
+
+class WriteOutbox:
+    """Durable queue of Calendar writes, drained in per-user batches with retries and backoff."""
+
+    def __init__(self, writer, path="calendar_outbox.db", service_for=None, on_done=None,
+                 max_attempts=8, base_delay=0.5, max_delay=60.0, poll=5.0):
+        # Usually a BatchWriter, so writes drained together go out as one batch call.
+        self.writer = writer
+        # Recovers a service for rows left over from a previous run: async (user_key, session_token) -> service | None
+        self.service_for = service_for
+        # Called with (user_key, op, event_id, event) once a write has landed.
+        self.on_done = on_done
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll = poll
+        self.stats = {"writes": 0, "retries": 0, "throttled": 0, "duplicates": 0, "failed": 0}
+        self._services = {}
+        self._waiters = defaultdict(list)
+        self._draining = {}
+        self._task = None
+        self._wake = None
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    idempotency_key TEXT NOT NULL UNIQUE,
+                    user_key TEXT NOT NULL,
+                    session_token TEXT,
+                    op TEXT NOT NULL,
+                    event_id TEXT NOT NULL,
+                    body TEXT,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)")
+
+    def enqueue(self, user_key, session_token, op, event_id, body=None, idempotency_key=None):
+        # Re-enqueueing the same key returns the existing row instead of queueing the write twice.
+        key = idempotency_key or f"{op}:{event_id}:{uuid.uuid4().hex}"
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO outbox (idempotency_key, user_key, session_token, op, event_id, body, "
+                "next_attempt_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, user_key, session_token, op, event_id, json.dumps(body) if body is not None else None, now, now),
+            )
+            row = self._conn.execute(
+                "SELECT id, status, result, error FROM outbox WHERE idempotency_key = ?", (key,)
+            ).fetchone()
+        return row
+
+    def submit(self, user_key, session_token, service, op, event_id, body=None, idempotency_key=None):
+        """Queue a write durably and return a future for the event (None for deletes)."""
+        self._services[user_key] = service
+        self._ensure_started()
+        row_id, status, result, error = self.enqueue(user_key, session_token, op, event_id, body, idempotency_key)
+        future = asyncio.get_running_loop().create_future()
+        if status == "done":
+            future.set_result(json.loads(result) if result else None)
+        elif status == "failed":
+            future.set_exception(WriteFailed(error))
+        else:
+            self._waiters[row_id].append(future)
+            self._wake.set()
+        return future
+
+    def pending_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._wake = asyncio.Event()
+            self._task = loop.create_task(self._drain_forever())
+
+    def start(self):
+        self._ensure_started()
+
+    async def _drain_forever(self):
+        while True:
+            try:
+                wait = self._start_drains()
+            except Exception:
+                logger.exception("Outbox drain failed")
+                wait = self.poll
+            # A timer rather than wait_for: on 3.11, wait_for swallows a cancel that lands just as a drain wakes it.
+            timer = asyncio.get_running_loop().call_later(min(wait, self.poll), self._wake.set)
+            try:
+                await self._wake.wait()
+            finally:
+                timer.cancel()
+            self._wake.clear()
+
+    def _due_rows(self, now):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, user_key, session_token, op, event_id, body, attempts, next_attempt_at "
+                "FROM outbox WHERE status = 'pending' ORDER BY id"
+            ).fetchall()
+        due = defaultdict(list)
+        blocked = set()
+        next_due = None
+        for row in rows:
+            user_key, event_id, next_attempt_at = row[1], row[4], row[7]
+            # A user with a drain in flight gets their rows picked up again once it finishes.
+            if user_key in self._draining:
+                continue
+            # Writes to the same event go out one at a time, in the order they were queued.
+            if (user_key, event_id) in blocked:
+                continue
+            blocked.add((user_key, event_id))
+            if next_attempt_at <= now:
+                due[user_key].append(row)
+            else:
+                next_due = next_attempt_at if next_due is None else min(next_due, next_attempt_at)
+        return due, next_due
+
+    def _start_drains(self):
+        """Starts a drain for each user with due writes; returns seconds until the next retry is due."""
+        now = time.time()
+        due, next_due = self._due_rows(now)
+        # Each user drains on their own task, so one stuck behind the governor or a slow call holds up nobody else.
+        for user_key, rows in due.items():
+            task = asyncio.ensure_future(self._drain_user(user_key, rows))
+            self._draining[user_key] = task
+            task.add_done_callback(lambda task, user_key=user_key: self._drained(user_key, task))
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM outbox WHERE status = 'done' AND updated_at < ?", (now - DONE_RETENTION,))
+        if due:
+            return 0
+        return max(0.0, next_due - time.time()) if next_due else self.poll
+
+    def _drained(self, user_key, task):
+        self._draining.pop(user_key, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Outbox drain failed", exc_info=task.exception())
+        if self._wake is not None:
+            self._wake.set()
+
+    async def drain_once(self):
+        """Send every due write once and wait for them; returns seconds until the next retry is due."""
+        wait = self._start_drains()
+        await asyncio.gather(*list(self._draining.values()), return_exceptions=True)
+        return wait
+
+    def _request(self, service, op, event_id, body):
+        events = service.events()
+        if op == "insert":
+            return events.insert(calendarId="primary", body=dict(body, id=event_id))
+        if op == "update":
+            return events.update(calendarId="primary", eventId=event_id, body=body)
+        return events.delete(calendarId="primary", eventId=event_id)
+
+    async def _drain_user(self, user_key, rows):
+        service = self._services.get(user_key)
+        if service is None and self.service_for is not None:
+            service = await self.service_for(user_key, rows[0][2])
+        if service is None:
+            for row in rows:
+                self._fail(row[0], "Session expired before the write could be sent. Please log in again.")
+            return
+        self._services[user_key] = service
+        requests = [self._request(service, op, event_id, json.loads(body) if body else None)
+                    for _, _, _, op, event_id, body, _, _ in rows]
+        results = await asyncio.gather(
+            *(self.writer.submit(user_key, service, request) for request in requests), return_exceptions=True
+        )
+        lookups = []
+        for row, result in zip(rows, results):
+            row_id, _, _, op, event_id, _, attempts, _ = row
+            if not isinstance(result, Exception):
+                self._done(row_id, user_key, op, event_id, result)
+                continue
+            outcome, retry_after = classify(result, op)
+            if outcome == "done":
+                self._done(row_id, user_key, op, event_id, None)
+            elif outcome == "duplicate":
+                # An earlier attempt landed but its reply was lost; fetch what's there instead of inserting again.
+                self.stats["duplicates"] += 1
+                lookups.append((row, None))
+            elif outcome == "throttled":
+                self._throttled(row_id, attempts, retry_after, result)
+            elif outcome == "retry" and attempts + 1 < self.max_attempts:
+                self._retry(row_id, attempts + 1, retry_after, result)
+            elif op == "insert":
+                # The id is ours, so an attempt that reached Google but lost its reply shows up as an existing event.
+                lookups.append((row, result))
+            else:
+                self._fail(row_id, str(result))
+        if lookups:
+            fetched = await asyncio.gather(
+                *(self.writer.submit(user_key, service, service.events().get(calendarId="primary", eventId=row[4]))
+                  for row, _ in lookups),
+                return_exceptions=True,
+            )
+            for (row, error), event in zip(lookups, fetched):
+                row_id, attempts = row[0], row[6] + 1
+                if not isinstance(event, Exception):
+                    self._done(row_id, user_key, "insert", row[4], event)
+                elif isinstance(event, RateLimited):
+                    self._throttled(row_id, row[6], event.retry_after, event)
+                elif error is None and attempts < self.max_attempts:
+                    self._retry(row_id, attempts, None, event)
+                else:
+                    self._fail(row_id, str(error or event))
+
+    def _done(self, row_id, user_key, op, event_id, event):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE outbox SET status = 'done', result = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(event) if event is not None else None, time.time(), row_id),
+            )
+        self.stats["writes"] += 1
+        if self.on_done is not None:
+            self.on_done(user_key, op, event_id, event)
+        for future in self._waiters.pop(row_id, []):
+            if not future.done():
+                future.set_result(event)
+
+    def _retry(self, row_id, attempts, retry_after, exc):
+        self._requeue(row_id, attempts, retry_delay(attempts, retry_after, self.base_delay, self.max_delay), exc)
+        self.stats["retries"] += 1
+
+    def _throttled(self, row_id, attempts, retry_after, exc):
+        # Back when the governor expects room, without using up one of the row's attempts.
+        self._requeue(row_id, attempts, retry_after or self.base_delay, exc)
+        self.stats["throttled"] += 1
+
+    def _requeue(self, row_id, attempts, delay, exc):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE outbox SET attempts = ?, next_attempt_at = ?, error = ?, updated_at = ? WHERE id = ?",
+                (attempts, time.time() + delay, str(exc), time.time(), row_id),
+            )
+        logger.info(f"Outbox write {row_id} retry {attempts} in {delay:.2f}s: {exc}")
+
+    def _fail(self, row_id, error):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE outbox SET status = 'failed', error = ?, updated_at = ? WHERE id = ?",
+                (error, time.time(), row_id),
+            )
+        self.stats["failed"] += 1
+        for future in self._waiters.pop(row_id, []):
+            if not future.done():
+                future.set_exception(WriteFailed(error))
@@ -0,0 +1,61 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.bench_support import BenchContext, agent_credentials, lift_google_quota, use_temp_stores
+
+use_temp_stores()
+lift_google_quota()
+
+from benchmarks.stub_calendar import StubCalendarServer
+from agents import calendar_agent
+from agents.blocking_runner import BlockingRunner
+from agents.service_cache import build_calendar_service
+from models.calendar_intent import CalendarIntent
+
+# Concurrent read_events intents per second through handle_intent against a slow stub backend.
+# "blocking" reproduces the old behaviour: Google calls run directly on the event loop.
+
+
+class InlineRunner:
+    async def run(self, user_key, fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+
+async def drive(users, per_user):
+    ctx = BenchContext()
+
+    async def one(user):
+        intent = CalendarIntent(type="read_events", **agent_credentials(f"refresh-{user}"))
+        await calendar_agent.handle_intent(ctx, "bench", intent)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(user) for user in range(users) for _ in range(per_user)))
+    return ctx.replies, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=32)
+    parser.add_argument("--per-user", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub round-trip latency in seconds")
+    args = parser.parse_args()
+
+    with StubCalendarServer(latency=args.latency) as stub:
+        options = {"api_endpoint": stub.api_endpoint}
+        calendar_agent.service_cache.build_fn = lambda creds: build_calendar_service(creds, client_options=options)
+        # Force an incremental sync round trip on every read so each intent waits on the backend.
+        calendar_agent.calendar_sync.min_interval = 0
+
+        for label, runner in [("blocking", InlineRunner()), ("runner", BlockingRunner(max_workers=16))]:
+            calendar_agent.runner = runner
+            calendar_agent.service_cache.clear()
+            replies, elapsed = asyncio.run(drive(args.users, args.per_user))
+            print(f"{label:<9} {replies / elapsed:8.1f} intents/s  ({replies} intents, {elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
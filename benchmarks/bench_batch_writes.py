@@ -0,0 +1,68 @@
+import argparse
+import asyncio
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_calendar import StubCalendarServer, stub_credentials
+from agents.service_cache import build_calendar_service
+from agents.batch_writer import BatchWriter, execute_batch
+
+# Events created per second: one insert per HTTPS call vs. coalesced batch requests.
+
+
+def insert_requests(service, count):
+    start = datetime.datetime(2030, 1, 1, 9, tzinfo=datetime.timezone.utc)
+    requests = []
+    for i in range(count):
+        slot = start + datetime.timedelta(hours=i)
+        body = {
+            "summary": f"Interview {i}",
+            "start": {"dateTime": slot.isoformat()},
+            "end": {"dateTime": (slot + datetime.timedelta(minutes=45)).isoformat()},
+        }
+        requests.append(service.events().insert(calendarId="primary", body=body))
+    return requests
+
+
+def report(label, count, elapsed, http_calls):
+    print(f"{label:<18} {count / elapsed:8.1f} events/s  ({http_calls} HTTP calls, {elapsed:.2f}s)")
+
+
+async def coalesced(service, requests, batch_uri):
+    writer = BatchWriter(batch_uri=batch_uri)
+    await asyncio.gather(*(writer.submit("bench-user", service, r) for r in requests))
+    return writer
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02, help="stub round-trip latency in seconds")
+    args = parser.parse_args()
+
+    with StubCalendarServer(latency=args.latency) as stub:
+        service = build_calendar_service(stub_credentials(), client_options={"api_endpoint": stub.api_endpoint})
+
+        calls = stub.state.requests
+        started = time.perf_counter()
+        for request in insert_requests(service, args.events):
+            request.execute()
+        report("unbatched", args.events, time.perf_counter() - started, stub.state.requests - calls)
+
+        calls = stub.state.requests
+        started = time.perf_counter()
+        execute_batch(service, insert_requests(service, args.events), batch_uri=stub.batch_uri)
+        report("batched", args.events, time.perf_counter() - started, stub.state.requests - calls)
+
+        calls = stub.state.requests
+        started = time.perf_counter()
+        asyncio.run(coalesced(service, insert_requests(service, args.events), stub.batch_uri))
+        report("coalesced writer", args.events, time.perf_counter() - started, stub.state.requests - calls)
+
+
+if __name__ == "__main__":
+    main()
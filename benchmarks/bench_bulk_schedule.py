@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.bench_support import BenchContext, agent_credentials, lift_google_quota, use_temp_stores
+
+use_temp_stores()
+lift_google_quota()
+
+from benchmarks.stub_calendar import StubCalendarServer
+from agents import calendar_agent
+from agents.service_cache import build_calendar_service
+from models.calendar_intent import CalendarIntent, EventSpec
+
+# Events booked per second: N create_event check+confirm round trips vs one create_events intent
+# carrying a daily RRULE for the same N occurrences.
+
+CREDENTIALS = agent_credentials()
+
+
+async def handle(ctx, intent):
+    await calendar_agent.handle_intent(ctx, "bench", intent)
+    return ctx.last
+
+
+async def one_at_a_time(first_start, count):
+    ctx = BenchContext()
+    created = 0
+    for day in range(count):
+        start = first_start + datetime.timedelta(days=day)
+        intent = CalendarIntent(
+            type="create_event", title="Standup", start_time=start.isoformat(),
+            end_time=(start + datetime.timedelta(minutes=15)).isoformat(), **CREDENTIALS,
+        )
+        checked = await handle(ctx, intent)
+        if checked.status == "pending":
+            checked.status = "confirmed"
+            reply = await handle(ctx, checked)
+            created += reply.message.startswith("📅")
+    return created
+
+
+async def bulk(first_start, count):
+    ctx = BenchContext()
+    spec = EventSpec(
+        title="Standup", start_time=first_start.isoformat(),
+        end_time=(first_start + datetime.timedelta(minutes=15)).isoformat(), rrule=f"FREQ=DAILY;COUNT={count}",
+    )
+    checked = await handle(ctx, CalendarIntent(type="create_events", events=[spec], **CREDENTIALS))
+    checked.status = "confirmed"
+    reply = await handle(ctx, checked)
+    return sum(item.status == "created" for item in reply.events)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02, help="stub round-trip latency in seconds")
+    args = parser.parse_args()
+
+    with StubCalendarServer(latency=args.latency) as stub:
+        options = {"api_endpoint": stub.api_endpoint}
+        calendar_agent.service_cache.build_fn = lambda creds: build_calendar_service(creds, client_options=options)
+        calendar_agent.batch_writer.batch_uri = stub.batch_uri
+
+        base = datetime.datetime.now(datetime.timezone.utc).replace(hour=17, minute=0, second=0, microsecond=0)
+        # Each mode books into its own empty stretch of days so neither sees the other's events.
+        for offset, (label, mode) in enumerate([("one-by-one", one_at_a_time), ("bulk", bulk)]):
+            first_start = base + datetime.timedelta(days=1 + offset * (args.events + 1))
+            started = time.perf_counter()
+            created = asyncio.run(mode(first_start, args.events))
+            elapsed = time.perf_counter() - started
+            print(f"{label:<11} {created / elapsed:8.1f} events/s  ({created} created, {elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
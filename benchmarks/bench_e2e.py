@@ -0,0 +1,485 @@
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import platform
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baselines", "e2e.json")
+
+# End-to-end scenarios against local stand-ins for Google Calendar (benchmarks/stub_calendar.py)
+# and OpenAI (benchmarks/stub_openai.py), both with latency and error injection. "ui_*" scenarios
+# drive streamlit_ui.py headlessly through AppTest, with calendar_agent and frontend_agent serving
+# /submit in the same process; "agent_*" scenarios call the agents' handlers concurrently. Each
+# scenario runs in its own process so peak RSS and caches don't leak between them. Results are
+# compared against benchmarks/baselines/e2e.json.
+
+BASE_TIME = datetime.datetime(2031, 3, 3, 9, tzinfo=datetime.timezone(datetime.timedelta(hours=-8)))
+CREDENTIALS = {
+    "token": "stub-access-token",
+    "access_token": "stub-access-token",
+    "refresh_token": "stub-refresh-token",
+    "client_id": "stub-client-id",
+    "client_secret": "stub-client-secret",
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def configure_process(bench_dir):
+    # Everything the UI and the agents share goes through files and ports in bench_dir, as in production.
+    ports = {name: free_port() for name in ("frontend", "calendar", "hub")}
+    os.environ.update({
+        "CALENDAR_STORE_PATH": os.path.join(bench_dir, "calendar_store.db"),
+        "CALENDAR_OUTBOX_PATH": os.path.join(bench_dir, "calendar_outbox.db"),
+        "CREDENTIAL_STORE": os.path.join(bench_dir, "credentials.db"),
+        "PENDING_STORE": os.path.join(bench_dir, "pending_intents.db"),
+        "FRONTEND_AGENT_URL": f"http://127.0.0.1:{ports['frontend']}/submit",
+        "CALENDAR_AGENT_URL": f"http://127.0.0.1:{ports['calendar']}/submit",
+        "RESULT_HUB_PORT": str(ports["hub"]),
+        "RESULT_HUB_URL": f"http://127.0.0.1:{ports['hub']}/results",
+        # One scripted session sends prompts far faster than a person would; measure the pipeline, not the governor.
+        "OPENAI_USER_RATE": "100",
+        "OPENAI_USER_BURST": "100",
+        "OPENAI_PROJECT_RATE": "100",
+        "OPENAI_PROJECT_BURST": "100",
+        "OPENAI_MAX_WAIT": "30",
+        "GOOGLE_API_MAX_WAIT": "30",
+    })
+    return ports
+
+
+def responder(prompt):
+    # The fake LLM answers the harness's own prompts: "<kind> #<n>", or "<kind> #<n> tomorrow" for a date
+    # inside the busy index window (BASE_TIME is years out, so those lookups never touch the index).
+    kind, _, n = prompt.partition(" #")
+    n, _, day = n.partition(" ")
+    n = int(n)
+    start = BASE_TIME + datetime.timedelta(days=n // 8, hours=n % 8)
+    if day == "tomorrow":
+        tomorrow = datetime.datetime.now(BASE_TIME.tzinfo).date() + datetime.timedelta(days=1)
+        start = datetime.datetime.combine(tomorrow, datetime.time(9 + n % 8), BASE_TIME.tzinfo)
+    if kind == "book":
+        return {"type": "create_event", "title": f"Bench {n}", "start_time": start.isoformat(),
+                "end_time": (start + datetime.timedelta(minutes=45)).isoformat()}
+    if kind == "agenda":
+        return {"type": "read_events", "start_time": BASE_TIME.isoformat(),
+                "end_time": (BASE_TIME + datetime.timedelta(days=30)).isoformat()}
+    return {"type": "find_slot", "duration_minutes": 30, "start_time": start.isoformat(),
+            "end_time": (start + datetime.timedelta(days=2)).isoformat()}
+
+
+class LocalAgents:
+    """calendar_agent and frontend_agent handlers behind /submit on local ports, on a background event loop."""
+
+    def __init__(self, ports):
+        from agents import calendar_agent, frontend_agent
+
+        self.calendar_agent = calendar_agent
+        self.frontend_agent = frontend_agent
+        self.ports = ports
+        self.loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+
+    def context(self):
+        agents = self
+
+        class Context:
+            logger = logging.getLogger("bench.agents")
+
+            async def send(self, destination, message):
+                # Replies addressed to the frontend agent go to its handler, as uAgents would deliver them.
+                if destination == "frontend_agent":
+                    await agents.frontend_agent.display_response(agents.context(), "calendar_agent", message)
+
+        return Context()
+
+    async def _serve(self):
+        from aiohttp import web
+
+        from models.calendar_intent import CalendarIntent
+
+        def app(handler):
+            async def submit(request):
+                payload = await request.json()
+                intent = CalendarIntent(**payload["message"])
+                # uAgents acknowledges /submit before the handler runs; so does this.
+                asyncio.ensure_future(handler(self.context(), payload["sender"], intent))
+                return web.json_response({})
+
+            application = web.Application()
+            application.router.add_post("/submit", submit)
+            return application
+
+        for port, handler in ((self.ports["frontend"], self.frontend_agent.display_response),
+                              (self.ports["calendar"], self.calendar_agent.handle_intent)):
+            runner = web.AppRunner(app(handler), access_log=None)
+            await runner.setup()
+            await web.TCPSite(runner, "127.0.0.1", port).start()
+        self._ready.set()
+
+    def start(self):
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self.loop.run_until_complete(self._serve())
+            self.loop.run_forever()
+
+        threading.Thread(target=run, daemon=True).start()
+        self._ready.wait(10)
+
+    def run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+
+def point_agents_at(stub):
+    from agents import calendar_agent
+    from agents.service_cache import build_calendar_service
+
+    options = {"api_endpoint": stub.api_endpoint}
+    calendar_agent.service_cache.build_fn = lambda creds: build_calendar_service(creds, client_options=options)
+    calendar_agent.batch_writer.batch_uri = stub.batch_uri
+    calendar_agent.outbox.base_delay = 0.05
+    calendar_agent.outbox.max_delay = 1.0
+
+
+def last_message(app):
+    messages = [m.markdown[0].value for m in app.chat_message if m.markdown]
+    return messages[-1] if messages else ""
+
+
+def ui_session():
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(os.path.join(ROOT, "streamlit_ui.py"), default_timeout=60)
+    app.session_state["authenticated"] = True
+    app.session_state["openai_key"] = "sk-stub"
+    app.session_state["credentials"] = dict(CREDENTIALS)
+    app.run()
+    return app
+
+
+def ui_prompt(app, prompt):
+    started = time.perf_counter()
+    app.chat_input[0].set_value(prompt).run()
+    return time.perf_counter() - started, last_message(app)
+
+
+def ui_confirm(app):
+    buttons = [button for button in app.button if button.label.startswith("✅")]
+    if not buttons:
+        return None, ""
+    started = time.perf_counter()
+    buttons[0].click().run()
+    return time.perf_counter() - started, last_message(app)
+
+
+def succeeded(message):
+    return bool(message) and not message.startswith(("❌", "⏳", "🔐"))
+
+
+def scenario_ui_book(args, agents):
+    # Prompt -> LLM -> conflict check, then the Confirm click -> booked, one browser session.
+    app = ui_session()
+    check, confirm = Sample("ui_book_check", sequential=True), Sample("ui_book_confirm", sequential=True)
+    for n in range(args.prompts):
+        elapsed, message = ui_prompt(app, f"book #{n}")
+        check.add(elapsed, message.startswith("✅"))
+        elapsed, message = ui_confirm(app)
+        if elapsed is not None:
+            confirm.add(elapsed, message.startswith("📅"))
+    return [check, confirm]
+
+
+def scenario_ui_book_cold(args, agents):
+    # A user coming back after a while: their cached service and busy index have expired, so the conflict
+    # check has to rebuild both. With SPECULATIVE_PREFETCH on, that happens while the LLM is parsing.
+    from agents.shard_ring import user_key
+
+    app = ui_session()
+    user = user_key(CREDENTIALS["client_id"], CREDENTIALS["refresh_token"])
+    agents.calendar_agent.calendar_sync.min_interval = 0
+    sample = Sample("ui_book_cold", sequential=True)
+    for n in range(args.prompts):
+        agents.calendar_agent.busy_indexes.invalidate(user)
+        agents.calendar_agent.service_cache.clear()
+        elapsed, message = ui_prompt(app, f"book #{n} tomorrow")
+        sample.add(elapsed, message.startswith(("✅", "❌ Conflict")))
+    return [sample]
+
+
+def scenario_ui_agenda(args, agents):
+    app = ui_session()
+    sample = Sample("ui_agenda", sequential=True)
+    for n in range(args.prompts):
+        elapsed, message = ui_prompt(app, f"agenda #{n}")
+        sample.add(elapsed, succeeded(message))
+    return [sample]
+
+
+def scenario_ui_llm_faults(args, agents):
+    # The openai client retries 429/500 itself; this shows what that costs at the user's end.
+    app = ui_session()
+    sample = Sample("ui_llm_faults", sequential=True)
+    for n in range(args.prompts):
+        elapsed, message = ui_prompt(app, f"slot #{n}")
+        sample.add(elapsed, succeeded(message))
+    return [sample]
+
+
+def agent_intent(**fields):
+    from models.calendar_intent import CalendarIntent
+
+    credentials = {key: CREDENTIALS[key] for key in ("access_token", "client_id", "client_secret")}
+    return CalendarIntent(**credentials, **fields)
+
+
+class Recorder:
+    def __init__(self, agents):
+        self.agents = agents
+        self.replies = []
+
+    def context(self):
+        recorder = self
+        inner = self.agents.context()
+
+        class Context:
+            logger = inner.logger
+
+            async def send(self, destination, message):
+                recorder.replies.append(message)
+                await inner.send(destination, message)
+
+        return Context()
+
+
+async def timed_intent(agents, sample, intent, ok):
+    recorder = Recorder(agents)
+    started = time.perf_counter()
+    await agents.calendar_agent.handle_intent(recorder.context(), "frontend_agent", intent)
+    reply = recorder.replies[-1] if recorder.replies else None
+    sample.add(time.perf_counter() - started, reply is not None and ok(reply))
+    return reply
+
+
+def scenario_agent_agenda(args, agents):
+    sample = Sample("agent_agenda")
+
+    async def one(user):
+        await timed_intent(agents, sample, agent_intent(
+            type="read_events", refresh_token=f"refresh-{user}", start_time=BASE_TIME.isoformat(),
+            end_time=(BASE_TIME + datetime.timedelta(days=30)).isoformat(),
+        ), lambda reply: reply.message.startswith(("📅", "📭")))
+
+    async def run():
+        await asyncio.gather(*(one(user) for user in range(args.users) for _ in range(args.per_user)))
+
+    agents.run(run())
+    return [sample]
+
+
+def scenario_agent_book(args, agents):
+    # Check then confirm per user, with a share of Calendar calls failing (the outbox retries writes).
+    check, confirm = Sample("agent_book_check"), Sample("agent_book_confirm")
+
+    async def one(user, n):
+        start = BASE_TIME + datetime.timedelta(days=n, hours=user % 8)
+        fields = dict(title=f"Bench {user}-{n}", start_time=start.isoformat(),
+                      end_time=(start + datetime.timedelta(minutes=30)).isoformat(), refresh_token=f"refresh-{user}",
+                      intent_id=f"{user}-{n}")
+        reply = await timed_intent(agents, check, agent_intent(type="create_event", **fields),
+                                   lambda reply: reply.status == "pending")
+        if reply is not None and reply.status == "pending":
+            await timed_intent(agents, confirm, agent_intent(type="create_event", status="confirmed", **fields),
+                               lambda reply: reply.message.startswith("📅"))
+
+    async def run():
+        await asyncio.gather(*(one(user, n) for user in range(args.users) for n in range(args.per_user)))
+
+    agents.run(run())
+    return [check, confirm]
+
+
+def scenario_agent_find_slot(args, agents):
+    sample = Sample("agent_find_slot")
+
+    async def one(user, n):
+        start = BASE_TIME + datetime.timedelta(days=n)
+        await timed_intent(agents, sample, agent_intent(
+            type="find_slot", refresh_token=f"refresh-{user}", duration_minutes=30, start_time=start.isoformat(),
+            end_time=(start + datetime.timedelta(days=2)).isoformat(),
+        ), lambda reply: reply.message.startswith("🗓️"))
+
+    async def run():
+        await asyncio.gather(*(one(user, n) for user in range(args.users) for n in range(args.per_user)))
+
+    agents.run(run())
+    return [sample]
+
+
+# name -> (function, Calendar error rate, OpenAI error rate)
+SCENARIOS = {
+    "ui_book": (scenario_ui_book, 0.0, 0.0),
+    "ui_book_cold": (scenario_ui_book_cold, 0.0, 0.0),
+    "ui_agenda": (scenario_ui_agenda, 0.0, 0.0),
+    "ui_llm_faults": (scenario_ui_llm_faults, 0.0, 0.3),
+    "agent_agenda": (scenario_agent_agenda, 0.0, 0.0),
+    "agent_book": (scenario_agent_book, 0.1, 0.0),
+    "agent_find_slot": (scenario_agent_find_slot, 0.0, 0.0),
+}
+
+
+class Sample:
+    def __init__(self, name, sequential=False):
+        self.name = name
+        # One op at a time (a single browser session): throughput is 1 / mean latency, not ops / wall clock.
+        self.sequential = sequential
+        self.timings = []
+        self.failures = 0
+        self.started = time.perf_counter()
+
+    def add(self, elapsed, ok):
+        self.timings.append(elapsed)
+        self.failures += not ok
+
+    def summary(self):
+        wall = sum(self.timings) if self.sequential else time.perf_counter() - self.started
+        timings = sorted(self.timings)
+        pick = lambda q: timings[min(len(timings) - 1, int(len(timings) * q))] * 1000 if timings else 0.0
+        return {
+            "ops": len(timings),
+            "failures": self.failures,
+            "throughput": len(timings) / wall if wall else 0.0,
+            "p50_ms": statistics.median(timings) * 1000 if timings else 0.0,
+            "p95_ms": pick(0.95),
+            "p99_ms": pick(0.99),
+        }
+
+
+def run_scenario(name, args):
+    logging.basicConfig(level=getattr(logging, os.environ.get("BENCH_LOG_LEVEL", "WARNING")))
+    bench_dir = tempfile.mkdtemp()
+    ports = configure_process(bench_dir)
+
+    from benchmarks.stub_calendar import StubCalendarServer
+    from benchmarks.stub_openai import StubOpenAIServer
+
+    fn, calendar_errors, openai_errors = SCENARIOS[name]
+    with StubCalendarServer(latency=args.calendar_latency, error_rate=calendar_errors, seed=args.seed) as calendar, \
+            StubOpenAIServer(responder, latency=args.llm_latency, error_rate=openai_errors, seed=args.seed) as llm:
+        os.environ["OPENAI_BASE_URL"] = llm.base_url
+        agents = LocalAgents(ports)
+        point_agents_at(calendar)
+        agents.start()
+        samples = fn(args, agents)
+        rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        results = {sample.name: dict(sample.summary(), peak_rss_mb=round(rss_mb, 1)) for sample in samples}
+    print("RESULT " + json.dumps(results))
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    print(f"{'scenario':<20} {'ops':>5} {'fail':>5} {'ops/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rss MB':>7}  vs baseline")
+    for name, row in results.items():
+        base = baseline.get(name)
+        notes = []
+        if base:
+            # With ~15 samples per scenario p95/p99 are one or two requests and swing run to run,
+            # so they are reported but only the median, throughput and RSS can fail --check.
+            checks = [
+                ("p50", row["p50_ms"], base["p50_ms"], True, True),
+                ("p95", row["p95_ms"], base["p95_ms"], True, False),
+                ("ops/s", row["throughput"], base["throughput"], False, True),
+                ("rss", row["peak_rss_mb"], base["peak_rss_mb"], True, True),
+            ]
+            for label, value, reference, lower_is_better, gated in checks:
+                if not reference:
+                    continue
+                change = value / reference - 1
+                notes.append(f"{label} {change:+.0%}")
+                if gated and ((change > tolerance) if lower_is_better else (change < -tolerance)):
+                    regressions.append(f"{name} {label}")
+            if row["failures"] > base["failures"]:
+                notes.append(f"failures {base['failures']}->{row['failures']}")
+                regressions.append(f"{name} failures")
+        print(f"{name:<20} {row['ops']:5d} {row['failures']:5d} {row['throughput']:8.1f} {row['p50_ms']:9.1f} "
+              f"{row['p95_ms']:9.1f} {row['p99_ms']:9.1f} {row['peak_rss_mb']:7.1f}  {', '.join(notes) or 'no baseline'}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--prompts", type=int, default=15, help="prompts per ui_* scenario")
+    parser.add_argument("--users", type=int, default=16, help="concurrent users per agent_* scenario")
+    parser.add_argument("--per-user", type=int, default=4)
+    parser.add_argument("--calendar-latency", type=float, default=0.02, help="stub Calendar latency in seconds")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="stub OpenAI latency in seconds")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per scenario; metrics are the median across runs")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed change before a metric counts as a regression")
+    parser.add_argument("--save-baseline", action="store_true", help=f"write results to {os.path.relpath(BASELINE_PATH, ROOT)}")
+    parser.add_argument("--check", action="store_true", help="exit 1 when a scenario's p50, throughput, RSS or failures regressed against the baseline")
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_scenario(args.run, args)
+        return
+
+    child_args = [f"--prompts={args.prompts}", f"--users={args.users}", f"--per-user={args.per_user}",
+                  f"--calendar-latency={args.calendar_latency}", f"--llm-latency={args.llm_latency}", f"--seed={args.seed}"]
+    # One run of a scenario moves by 30% or more on a busy machine, so each is run --repeat times
+    # (interleaved, so drift hits every scenario alike) and each metric is the median across runs.
+    runs = {}
+    for _ in range(args.repeat):
+        for name in args.scenarios:
+            proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--run", name, *child_args],
+                                  cwd=ROOT, capture_output=True, text=True)
+            lines = [line for line in proc.stdout.splitlines() if line.startswith("RESULT ")]
+            if proc.returncode or not lines:
+                print(f"{name} failed:\n{proc.stdout}\n{proc.stderr[-3000:]}")
+                sys.exit(1)
+            for sample, row in json.loads(lines[-1][len("RESULT "):]).items():
+                runs.setdefault(sample, []).append(row)
+    results = {sample: {key: statistics.median_low(row[key] for row in rows) for key in rows[0]}
+               for sample, rows in runs.items()}
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f).get("results", {})
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+        with open(BASELINE_PATH, "w") as f:
+            json.dump({
+                "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+                "settings": {key: getattr(args, key) for key in ("prompts", "users", "per_user", "calendar_latency", "llm_latency", "seed", "repeat")},
+                "results": {**baseline, **results},
+            }, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {os.path.relpath(BASELINE_PATH, ROOT)}")
+    if regressions:
+        print(f"Regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
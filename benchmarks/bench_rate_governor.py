@@ -0,0 +1,97 @@
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.rate_governor import RateGovernor, RateLimited, TokenBucket
+
+# One noisy user floods reads while quiet users read and write at a normal pace, against an
+# upstream that enforces a project quota (403 rateLimitExceeded once its bucket is empty).
+# "none" sends everything straight upstream; "governor" admits calls through a RateGovernor.
+
+
+class Upstream:
+    def __init__(self, rate, burst, latency):
+        self.quota = TokenBucket(rate, burst)
+        self.latency = latency
+
+    async def call(self):
+        now = time.monotonic()
+        self.quota.refill(now)
+        if self.quota.tokens < 1:
+            raise RuntimeError("403 rateLimitExceeded")
+        self.quota.take(1, now)
+        await asyncio.sleep(self.latency)
+
+
+async def scenario(governor, upstream, noisy_calls, quiet_users, quiet_calls, interval):
+    outcomes = defaultdict(lambda: defaultdict(int))
+    latencies = defaultdict(list)
+
+    async def one(user, kind, label):
+        started = time.perf_counter()
+        try:
+            if governor is not None:
+                await governor.acquire(user, write=kind == "write")
+            await upstream.call()
+            outcomes[label]["ok"] += 1
+        except RateLimited:
+            outcomes[label]["rejected"] += 1
+        except RuntimeError:
+            outcomes[label]["403"] += 1
+        latencies[label].append(time.perf_counter() - started)
+
+    async def quiet(user):
+        calls = []
+        for i in range(quiet_calls):
+            kind = "write" if i % 4 == 3 else "read"
+            calls.append(asyncio.ensure_future(one(f"quiet-{user}", kind, f"quiet {kind}")))
+            await asyncio.sleep(interval)
+        await asyncio.gather(*calls)
+
+    noisy = [one("noisy", "read", "noisy read") for _ in range(noisy_calls)]
+    await asyncio.gather(*noisy, *(quiet(user) for user in range(quiet_users)))
+    return outcomes, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--noisy-calls", type=int, default=600)
+    parser.add_argument("--quiet-users", type=int, default=8)
+    parser.add_argument("--quiet-calls", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.25, help="seconds between a quiet user's calls")
+    parser.add_argument("--project-rate", type=float, default=50)
+    parser.add_argument("--latency", type=float, default=0.01, help="upstream latency in seconds")
+    args = parser.parse_args()
+
+    for label in ("none", "governor"):
+        upstream = Upstream(args.project_rate, args.project_rate * 2, args.latency)
+        # Slightly under the upstream quota so the governor, not Google, is the one saying no.
+        governor = None if label == "none" else RateGovernor(
+            "bench", user_rate=5, user_burst=10, project_rate=args.project_rate * 0.9,
+            project_burst=args.project_rate * 1.8, max_wait=2.0,
+        )
+        started = time.perf_counter()
+        outcomes, latencies = asyncio.run(scenario(
+            governor, upstream, args.noisy_calls, args.quiet_users, args.quiet_calls, args.interval
+        ))
+        print(f"{label} ({time.perf_counter() - started:.2f}s)")
+        for kind in ("noisy read", "quiet read", "quiet write"):
+            counts = outcomes[kind]
+            timings = sorted(latencies[kind])
+            if not timings:
+                continue
+            p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000
+            print(f"  {kind:<12} ok {counts['ok']:4d}  403 {counts['403']:4d}  queued-out {counts['rejected']:4d}  "
+                  f"p50 {statistics.median(timings) * 1000:7.1f}ms  p99 {p99:7.1f}ms")
+        if governor is not None:
+            print(f"  metrics {governor.metrics()}")
+
+
+if __name__ == "__main__":
+    main()
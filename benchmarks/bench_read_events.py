@@ -0,0 +1,76 @@
+import argparse
+import datetime
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_calendar import StubCalendarServer, stub_credentials
+from agents.busy_index import iter_pages
+from agents.event_reader import PAGE_SIZE, format_event
+from agents.service_cache import build_calendar_service
+
+# Reading a large range: full event resources collected into one list before formatting
+# vs fields=-projected pages formatted and handed on one at a time.
+
+
+def read_all(service, time_min, time_max):
+    events = []
+    page_token = None
+    while True:
+        response = service.events().list(
+            calendarId="primary", timeMin=time_min, timeMax=time_max, singleEvents=True, pageToken=page_token,
+        ).execute()
+        events.extend(response.get("items", []))
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            break
+    yield [format_event(event) for event in events]
+
+
+def read_streamed(service, time_min, time_max):
+    for page in iter_pages(service, first_page_size=PAGE_SIZE, timeMin=time_min, timeMax=time_max):
+        yield [format_event(event) for event in page]
+
+
+def measure(label, reader, service, time_min, time_max):
+    tracemalloc.start()
+    started = time.perf_counter()
+    first = None
+    lines = 0
+    for chunk in reader(service, time_min, time_max):
+        if first is None and chunk:
+            first = time.perf_counter() - started
+        lines += len(chunk)
+    total = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<9} first={first * 1000:8.1f}ms  total={total * 1000:8.1f}ms  peak={peak / 1e6:6.1f}MB  ({lines} events)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=3000)
+    parser.add_argument("--description-bytes", type=int, default=2000, help="payload the projection leaves out")
+    parser.add_argument("--latency", type=float, default=0.01, help="stub round-trip latency in seconds")
+    args = parser.parse_args()
+
+    with StubCalendarServer(latency=args.latency) as stub:
+        service = build_calendar_service(stub_credentials(), client_options={"api_endpoint": stub.api_endpoint})
+        start = datetime.datetime(2030, 1, 1, 9, tzinfo=datetime.timezone.utc)
+        for i in range(args.events):
+            begin = start + datetime.timedelta(hours=3 * i)
+            stub.state.add_event(
+                f"Event {i}", begin.isoformat(), (begin + datetime.timedelta(hours=1)).isoformat(),
+                description="x" * args.description_bytes, attendees=[{"email": f"guest{n}@example.com"} for n in range(10)],
+            )
+        time_min = start.isoformat()
+        time_max = (start + datetime.timedelta(hours=3 * args.events)).isoformat()
+        measure("full", read_all, service, time_min, time_max)
+        measure("streamed", read_streamed, service, time_min, time_max)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_calendar import StubCalendarServer, stub_credentials
+from agents.service_cache import ServiceCache, build_calendar_service
+
+# Per-intent latency of "authorize + build + events.list" with and without the service cache.
+
+INTENTS = 200
+
+
+def run(label, get_service):
+    timings = []
+    for _ in range(INTENTS):
+        started = time.perf_counter()
+        service = get_service()
+        service.events().list(calendarId="primary", maxResults=1).execute()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    p50 = statistics.median(timings) * 1000
+    p99 = timings[int(len(timings) * 0.99) - 1] * 1000
+    print(f"{label:<10} p50={p50:7.2f}ms  p99={p99:7.2f}ms  total={sum(timings):6.2f}s")
+
+
+def main():
+    with StubCalendarServer() as stub:
+        options = {"api_endpoint": stub.api_endpoint}
+        stub.state.add_event("Standup", "2030-01-01T09:00:00Z", "2030-01-01T09:15:00Z")
+
+        run("uncached", lambda: build_calendar_service(stub_credentials(), client_options=options))
+
+        cache = ServiceCache(build_fn=lambda creds: build_calendar_service(creds, client_options=options))
+        run("cached", lambda: cache.get_service("stub-access-token", "stub-refresh-token", "stub-client-id", "stub-client-secret"))
+        print(f"cache stats: {cache.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.shard_ring import HashRing, user_key
+from benchmarks.bench_support import BenchContext, agent_credentials, lift_google_quota, use_temp_stores
+
+# read_events intents per second across 1, 2 and 4 calendar agent shards, each its own process with
+# its own stub backend. The driver routes users with the same ring the UI uses. Shards only add
+# throughput when there are cores to put them on: on a single core the rate stays roughly flat.
+# The last line says whether near-linear scaling was actually shown on this machine; only a run
+# where every shard (and the driver) had a core of its own and reached LINEAR_FLOOR of linear counts.
+
+BASE_PORT = 8950
+# Share of linear (shards x the 1-shard rate) a run has to reach to count as near-linear.
+LINEAR_FLOOR = 0.8
+
+
+def usable_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def run_worker(shard, shards, latency):
+    use_temp_stores()
+    lift_google_quota()
+    os.environ["CALENDAR_SHARD"] = str(shard)
+    os.environ["CALENDAR_SHARDS"] = str(shards)
+
+    from aiohttp import web
+
+    from benchmarks.stub_calendar import StubCalendarServer
+    from agents import calendar_agent
+    from agents.service_cache import build_calendar_service
+    from models.calendar_intent import CalendarIntent
+
+    ctx = BenchContext()
+
+    async def submit(request):
+        payload = await request.json()
+        await calendar_agent.handle_intent(ctx, payload["sender"], CalendarIntent(**payload["message"]))
+        return web.json_response({"status": "ok"})
+
+    async def health(request):
+        return web.json_response({"shard": shard})
+
+    with StubCalendarServer(latency=latency) as stub:
+        options = {"api_endpoint": stub.api_endpoint}
+        calendar_agent.service_cache.build_fn = lambda creds: build_calendar_service(creds, client_options=options)
+        # Force an incremental sync round trip on every read so each intent waits on the backend.
+        calendar_agent.calendar_sync.min_interval = 0
+        app = web.Application()
+        app.router.add_post("/submit", submit)
+        app.router.add_get("/health", health)
+        web.run_app(app, host="127.0.0.1", port=BASE_PORT + shard, print=None, access_log=None)
+
+
+async def wait_ready(session, urls, timeout=30):
+    deadline = time.monotonic() + timeout
+    for url in urls:
+        while True:
+            try:
+                async with session.get(url.replace("/submit", "/health")) as response:
+                    if response.status == 200:
+                        break
+            except OSError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Shard at {url} did not start")
+            await asyncio.sleep(0.2)
+
+
+async def drive(urls, users, per_user, concurrency):
+    import aiohttp
+
+    ring = HashRing(range(len(urls)))
+    limit = asyncio.Semaphore(concurrency)
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+        await wait_ready(session, urls)
+
+        async def one(user):
+            creds = agent_credentials(f"refresh-{user}")
+            url = urls[ring.node_for(user_key(creds["client_id"], creds["refresh_token"]))]
+            async with limit:
+                async with session.post(url, json={"sender": "bench", "message": dict(type="read_events", **creds)}) as response:
+                    return response.status == 200
+
+        # One warm-up read per user so every shard has built its services and synced once.
+        await asyncio.gather(*(one(user) for user in range(users)))
+        started = time.perf_counter()
+        results = await asyncio.gather(*(one(user) for user in range(users) for _ in range(per_user)))
+        return sum(results), time.perf_counter() - started
+
+
+def run_driver(args):
+    cpus = usable_cpus()
+    print(f"{cpus} usable CPU(s)")
+    baseline = None
+    efficiencies = {}
+    for shards in args.shards:
+        urls = [f"http://127.0.0.1:{BASE_PORT + shard}/submit" for shard in range(shards)]
+        workers = [
+            subprocess.Popen([sys.executable, os.path.abspath(__file__), "--worker", "--shard", str(shard),
+                              "--shard-count", str(shards), "--latency", str(args.latency)])
+            for shard in range(shards)
+        ]
+        try:
+            ok, elapsed = asyncio.run(drive(urls, args.users, args.per_user, args.concurrency))
+        finally:
+            for worker in workers:
+                worker.terminate()
+            for worker in workers:
+                worker.wait()
+        rate = ok / elapsed
+        if baseline is None:
+            baseline = rate / shards
+        efficiencies[shards] = rate / (baseline * shards)
+        print(f"{shards} shard(s) {rate:8.1f} intents/s  x{rate / (baseline * args.shards[0]):4.2f}  "
+              f"{efficiencies[shards]:4.0%} of linear  ({ok} intents, {elapsed:.2f}s)")
+
+    scaled = [shards for shards in efficiencies if shards > args.shards[0]]
+    if not scaled:
+        print("Scaling not demonstrated: run more than one shard count.")
+    elif max(scaled) + 1 > cpus:
+        # Each shard needs a core of its own, plus one for this driver.
+        print(f"Scaling not demonstrated: {max(scaled)} shards and the driver on {cpus} CPU(s) share cores. "
+              f"Run on a machine with at least {max(scaled) + 1} CPUs.")
+    elif all(efficiencies[shards] >= LINEAR_FLOOR for shards in scaled):
+        print(f"Near-linear scaling demonstrated: every run reached {LINEAR_FLOOR:.0%} of linear or better.")
+    else:
+        print(f"Scaling not demonstrated: below {LINEAR_FLOOR:.0%} of linear at "
+              f"{', '.join(str(shards) for shards in scaled if efficiencies[shards] < LINEAR_FLOOR)} shards.")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--users", type=int, default=64)
+    parser.add_argument("--per-user", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub round-trip latency in seconds")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--shard", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--shard-count", type=int, default=1, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.shard, args.shard_count, args.latency)
+    else:
+        run_driver(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Time from submitting a scheduling prompt to the conflict answer, for a user whose service and busy
+# index have gone cold, with and without the speculative prefetch that runs while the LLM parses.
+# Runs bench_e2e.py's ui_book_cold scenario in a fresh process per round, alternating the two modes.
+
+
+def run(mode, args):
+    env = dict(os.environ, SPECULATIVE_PREFETCH=mode)
+    proc = subprocess.run(
+        [sys.executable, os.path.join(ROOT, "benchmarks", "bench_e2e.py"), "--run", "ui_book_cold",
+         f"--prompts={args.prompts}", f"--calendar-latency={args.calendar_latency}", f"--llm-latency={args.llm_latency}"],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    lines = [line for line in proc.stdout.splitlines() if line.startswith("RESULT ")]
+    if proc.returncode or not lines:
+        print(f"ui_book_cold failed:\n{proc.stdout}\n{proc.stderr[-3000:]}")
+        sys.exit(1)
+    return json.loads(lines[-1][len("RESULT "):])["ui_book_cold"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--prompts", type=int, default=10, help="prompts per round")
+    parser.add_argument("--calendar-latency", type=float, default=0.15, help="stub Calendar latency in seconds")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="stub OpenAI latency in seconds")
+    args = parser.parse_args()
+
+    rows = {"0": [], "1": []}
+    for _ in range(args.rounds):
+        for mode in rows:
+            rows[mode].append(run(mode, args))
+
+    print(f"{'prefetch':<10} {'ops':>5} {'fail':>5} {'p50 ms':>9} {'p95 ms':>9}")
+    medians = {}
+    for mode, results in rows.items():
+        p50 = sorted(r["p50_ms"] for r in results)[len(results) // 2]
+        p95 = sorted(r["p95_ms"] for r in results)[len(results) // 2]
+        medians[mode] = p50
+        print(f"{'on' if mode == '1' else 'off':<10} {sum(r['ops'] for r in results):5d} "
+              f"{sum(r['failures'] for r in results):5d} {p50:9.1f} {p95:9.1f}")
+    saved = medians["0"] - medians["1"]
+    print(f"time to conflict answer: {saved:+.1f} ms saved at p50 ({saved / medians['0']:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import logging
+import os
+import tempfile
+
+from benchmarks.stub_calendar import stub_credentials
+
+# Shared by the benchmarks that drive calendar_agent in-process.
+
+
+def use_temp_stores():
+    """Points every SQLite file calendar_agent opens at a fresh temp dir. Call before importing calendar_agent."""
+    bench_dir = tempfile.mkdtemp()
+    os.environ.setdefault("CALENDAR_STORE_PATH", os.path.join(bench_dir, "bench_store.db"))
+    os.environ.setdefault("CALENDAR_OUTBOX_PATH", os.path.join(bench_dir, "bench_outbox.db"))
+    os.environ.setdefault("CREDENTIAL_STORE", os.path.join(bench_dir, "credentials.db"))
+    os.environ.setdefault("PENDING_STORE", os.path.join(bench_dir, "pending_intents.db"))
+    return bench_dir
+
+
+def lift_google_quota():
+    """Raises calendar_agent's Google API governor limits far above what a benchmark sends, unless already set.
+
+    Call before importing calendar_agent. The stub has no quota, so these benchmarks measure the pipeline and
+    not the governor; bench_rate_governor.py is the one that measures the governor.
+    """
+    for name in ("USER_RATE", "USER_BURST", "PROJECT_RATE", "PROJECT_BURST"):
+        os.environ.setdefault(f"GOOGLE_API_{name}", "100000")
+
+
+def agent_credentials(refresh_token=None):
+    # The CalendarIntent credential fields for the stub's fake account; a distinct refresh token is a distinct user.
+    creds = stub_credentials()
+    return {
+        "access_token": creds.token,
+        "refresh_token": refresh_token or creds.refresh_token,
+        "client_id": creds.client_id,
+        "client_secret": creds.client_secret,
+    }
+
+
+class BenchContext:
+    """Stands in for a uAgents Context: counts the agent's replies and keeps the last one."""
+
+    logger = logging.getLogger("bench")
+
+    def __init__(self):
+        self.replies = 0
+        self.last = None
+
+    async def send(self, destination, message):
+        self.replies += 1
+        self.last = message
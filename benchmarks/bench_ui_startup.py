@@ -0,0 +1,86 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cold import cost and per-rerun wall-clock of the landing page (no OpenAI key, not logged in).
+
+HEAVY_PACKAGES = ["openai", "googleapiclient", "google_auth_oauthlib", "uagents"]
+
+CHILD = """
+import json, statistics, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file("streamlit_ui.py", default_timeout=30)
+app.run()
+first = time.perf_counter() - started
+reruns = []
+for _ in range({reruns}):
+    started = time.perf_counter()
+    app.run()
+    reruns.append(time.perf_counter() - started)
+print("RESULT " + json.dumps({{
+    "first_ms": first * 1000,
+    "rerun_p50_ms": statistics.median(reruns) * 1000,
+    "rerun_max_ms": max(reruns) * 1000,
+    "exceptions": [str(e.value) for e in app.exception],
+    "loaded": [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+\d+ \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def top_level_import_costs(stderr):
+    # Cumulative microseconds of each outermost import, rolled up per top-level package.
+    costs = defaultdict(int)
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match and len(match[2]) == 1:
+            costs[match[3].split(".")[0]] += int(match[1])
+    return costs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=ROOT, PENDING_STORE="memory", RESULT_HUB_PORT="0")
+    code = CHILD.format(reruns=args.reruns, heavy=HEAVY_PACKAGES)
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - started
+    results = [line for line in proc.stdout.splitlines() if line.startswith("RESULT ")]
+    if proc.returncode or not results:
+        print(proc.stdout)
+        print("\n".join(line for line in proc.stderr.splitlines() if not line.startswith("import time:")))
+        sys.exit(1)
+    result = json.loads(results[-1][len("RESULT "):])
+
+    costs = top_level_import_costs(proc.stderr)
+    print(f"process wall   {wall * 1000:8.1f}ms")
+    print(f"first run      {result['first_ms']:8.1f}ms")
+    print(f"rerun p50      {result['rerun_p50_ms']:8.1f}ms  (max {result['rerun_max_ms']:.1f}ms over {args.reruns})")
+    print(f"heavy loaded   {', '.join(result['loaded']) or 'none'}")
+    if result["exceptions"]:
+        print(f"app exceptions {result['exceptions']}")
+    print("\ncumulative import time by top-level package:")
+    for name, micros in sorted(costs.items(), key=lambda item: -item[1])[: args.top]:
+        print(f"  {name:<24} {micros / 1000:8.1f}ms")
+    for name in HEAVY_PACKAGES:
+        if name in costs:
+            print(f"  {name:<24} {costs[name] / 1000:8.1f}ms  (heavy)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import argparse
+import datetime
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.credential_store import new_session_token
+from models.calendar_intent import CalendarIntent, EventSpec, TimeSlot
+from models.envelope import pack, unpack
+
+# Bytes per message and encode/decode cost: the full model JSON with inline credentials,
+# the model JSON with a session token and no unset fields, and the compact envelope.
+
+# Typical lengths of Google OAuth values.
+INLINE_CREDENTIALS = {
+    "access_token": "ya29." + "a" * 213,
+    "refresh_token": "1//" + "r" * 100,
+    "client_id": "1234567890-" + "c" * 32 + ".apps.googleusercontent.com",
+    "client_secret": "GOCSPX-" + "s" * 28,
+}
+
+
+def sample_intents():
+    start = datetime.datetime(2030, 1, 7, 9, tzinfo=datetime.timezone(datetime.timedelta(hours=-8)))
+    ids = {"session_id": "f" * 32, "intent_id": "e" * 32, "request_id": "d" * 32}
+
+    def at(days, hours=0, minutes=60):
+        begin = start + datetime.timedelta(days=days, hours=hours)
+        return begin.isoformat(), (begin + datetime.timedelta(minutes=minutes)).isoformat()
+
+    conflict_start, conflict_end = at(0)
+    slots = [TimeSlot(start_time=s, end_time=e) for s, e in (at(0, 2), at(0, 4), at(1))]
+    events = [EventSpec(title="Interview", start_time=s, end_time=e, status="free", message=f"✅ Interview {s}")
+              for s, e in (at(day // 4, 2 * (day % 4)) for day in range(20))]
+    return {
+        "create_event": dict(type="create_event", title="Team sync", start_time=conflict_start, end_time=conflict_end,
+                             status="conflict", message="❌ Conflict: Standup already scheduled at this time.",
+                             slots=slots, **ids),
+        "create_events x20": dict(type="create_events", events=events, status="pending", **ids),
+        "read_events": dict(type="read_events", **ids),
+    }
+
+
+def measure(label, encode, decode, number):
+    raw = encode()
+    encode_us = min(timeit.repeat(encode, number=number, repeat=5)) / number * 1e6
+    decode_us = min(timeit.repeat(lambda: decode(raw), number=number, repeat=5)) / number * 1e6
+    print(f"  {label:<10} {len(raw):6d} B   encode {encode_us:7.1f} µs   decode {decode_us:7.1f} µs")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    token = new_session_token()
+    for name, fields in sample_intents().items():
+        inline = CalendarIntent(**fields, **INLINE_CREDENTIALS)
+        by_reference = CalendarIntent(**fields, session_token=token)
+        print(name)
+        measure("inline", inline.json, CalendarIntent.parse_raw, args.number)
+        measure("token", lambda: by_reference.json(exclude_none=True), CalendarIntent.parse_raw, args.number)
+        measure("envelope", lambda: pack(by_reference), lambda raw: unpack(raw, typed=True), args.number)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import argparse
+import asyncio
+import collections
+import datetime
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.bench_support import BenchContext, agent_credentials, lift_google_quota, use_temp_stores
+
+BENCH_DIR = use_temp_stores()
+lift_google_quota()
+
+from benchmarks.stub_calendar import StubCalendarServer
+from agents import calendar_agent
+from agents.service_cache import build_calendar_service
+from agents.write_outbox import WriteOutbox
+from models.calendar_intent import CalendarIntent
+
+# Confirmed bookings against a stub that fails a share of writes (503, 429 with Retry-After,
+# and 503 after the write was applied). "direct" is a single batch-writer call per booking;
+# "outbox" goes through handle_intent and the durable outbox. A final round checks that rows
+# queued by one outbox instance are sent by a fresh one, as after an agent restart.
+
+CREDENTIALS = agent_credentials()
+
+
+def fault_plan(count, rate, seed=7):
+    rng = random.Random(seed)
+    kinds = [(503, None, False), (429, 1, False), (503, None, True)]
+    return [rng.choice(kinds) if rng.random() < rate else None for _ in range(count)]
+
+
+def booking(start, title, token):
+    return CalendarIntent(
+        type="create_event", status="confirmed", title=title, start_time=start.isoformat(),
+        end_time=(start + datetime.timedelta(minutes=30)).isoformat(), intent_id=title, session_token=token,
+    )
+
+
+def report(label, stub, titles, timings, elapsed):
+    with stub.state.lock:
+        live = [e["summary"] for e in stub.state.events.values() if e["status"] != "cancelled"]
+    counts = collections.Counter(summary for summary in live if summary in titles)
+    booked = len(counts)
+    duplicates = sum(n - 1 for n in counts.values())
+    timings.sort()
+    p50 = statistics.median(timings) * 1000 if timings else 0
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000 if timings else 0
+    print(f"{label:<8} booked {booked:4d}/{len(titles)}  duplicates {duplicates:3d}  "
+          f"p50 {p50:7.1f}ms  p99 {p99:7.1f}ms  ({elapsed:.2f}s)")
+
+
+async def run_direct(stub, service, user_key, base, count):
+    titles = [f"direct-{i}" for i in range(count)]
+    timings = []
+
+    async def one(i):
+        start = base + datetime.timedelta(hours=i)
+        body = calendar_agent.event_body(titles[i], start.isoformat(), (start + datetime.timedelta(minutes=30)).isoformat())
+        started = time.perf_counter()
+        try:
+            await calendar_agent.batch_writer.submit(user_key, service, service.events().insert(calendarId="primary", body=body))
+        except Exception:
+            pass
+        timings.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    report("direct", stub, set(titles), timings, time.perf_counter() - started)
+
+
+async def run_outbox(stub, token, base, count):
+    titles = [f"outbox-{i}" for i in range(count)]
+    timings = []
+    ctx = BenchContext()
+
+    async def one(i):
+        started = time.perf_counter()
+        await calendar_agent.handle_intent(ctx, "bench", booking(base + datetime.timedelta(hours=i), titles[i], token))
+        timings.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    report("outbox", stub, set(titles), timings, time.perf_counter() - started)
+    print(f"         outbox stats {calendar_agent.outbox.stats}")
+
+
+async def run_restart(stub, service, user_key, token, base, count):
+    # Rows written by one outbox that never got to send them (the agent died right after queueing)
+    # are sent by a fresh instance that only has the session token to go on.
+    titles = [f"restart-{i}" for i in range(count)]
+    path = os.path.join(BENCH_DIR, "restart_outbox.db")
+    first = WriteOutbox(calendar_agent.batch_writer, path)
+    for i, title in enumerate(titles):
+        start = base + datetime.timedelta(hours=i)
+        body = calendar_agent.event_body(title, start.isoformat(), (start + datetime.timedelta(minutes=30)).isoformat())
+        first.enqueue(user_key, token, "insert", title.replace("-", ""), body, idempotency_key=title)
+    print(f"restart  {first.pending_count()} writes queued before the restart")
+
+    stub.state.inject_faults(count // 2, status=503, after_commit=True)
+    second = WriteOutbox(calendar_agent.batch_writer, path, service_for=calendar_agent.outbox_service, base_delay=0.05)
+    started = time.perf_counter()
+    while second.pending_count():
+        await asyncio.sleep(await second.drain_once())
+    report("restart", stub, set(titles), [], time.perf_counter() - started)
+    print(f"         outbox stats {second.stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bookings", type=int, default=100)
+    parser.add_argument("--fault-rate", type=float, default=0.4)
+    parser.add_argument("--latency", type=float, default=0.01, help="stub round-trip latency in seconds")
+    args = parser.parse_args()
+    logging.getLogger("agents.write_outbox").setLevel(logging.WARNING)
+
+    with StubCalendarServer(latency=args.latency) as stub:
+        options = {"api_endpoint": stub.api_endpoint}
+        calendar_agent.service_cache.build_fn = lambda creds: build_calendar_service(creds, client_options=options)
+        calendar_agent.batch_writer.batch_uri = stub.batch_uri
+        calendar_agent.outbox.base_delay = 0.05
+        calendar_agent.outbox.max_delay = 2.0
+        token = calendar_agent.credential_store.register(CREDENTIALS)
+        user_key = calendar_agent.service_cache.cache_key(CREDENTIALS["client_id"], CREDENTIALS["refresh_token"])
+        service = calendar_agent.service_cache.get_service(*CREDENTIALS.values())
+        base = datetime.datetime(2030, 1, 7, 9, tzinfo=datetime.timezone.utc)
+
+        stub.state.faults.extend(fault_plan(args.bookings, args.fault_rate))
+        asyncio.run(run_direct(stub, service, user_key, base, args.bookings))
+        stub.state.faults.clear()
+        stub.state.faults.extend(fault_plan(args.bookings * 2, args.fault_rate))
+        asyncio.run(run_outbox(stub, token, base + datetime.timedelta(days=30), args.bookings))
+        stub.state.faults.clear()
+        asyncio.run(run_restart(stub, service, user_key, token, base + datetime.timedelta(days=60), 10))
+
+
+if __name__ == "__main__":
+    main()
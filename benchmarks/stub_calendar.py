@@ -0,0 +1,322 @@
+import datetime
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from email.parser import BytesParser
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from google.oauth2.credentials import Credentials
+
+# Minimal in-process stand-in for the Google Calendar v3 REST API.
+# Point googleapiclient at it with client_options={"api_endpoint": stub.api_endpoint}.
+
+
+def _when(value):
+    # Dates sort before same-day dateTimes, which is close enough for a stub.
+    return value.get("dateTime") or value.get("date")
+
+
+class StubCalendarState:
+    def __init__(self, latency=0.0, error_rate=0.0, seed=0):
+        self.latency = latency
+        # Share of all calls (reads included) answered with a 503 before doing anything.
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.events = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+        # Every mutation bumps seq; sync tokens are just the seq they were issued at.
+        self.seq = 0
+        self.changed_at = {}
+        self.token_floor = 0
+        # freeBusy answers for calendars other than "primary": {calendar_id: [{"start": ..., "end": ...}]}
+        self.calendar_busy = {}
+        # Injected write failures, consumed one per insert/update/delete: (status, retry_after, after_commit)
+        self.faults = deque()
+        self.inserts_applied = 0
+
+    def _touch(self, event_id):
+        self.seq += 1
+        self.changed_at[event_id] = self.seq
+
+    def add_event(self, summary, start, end, event_id=None, all_day=False, **extra):
+        # all_day takes dates ("2030-01-07") and stores them the way Google does, under "date".
+        event_id = event_id or uuid.uuid4().hex
+        key = "date" if all_day else "dateTime"
+        event = {
+            "id": event_id,
+            "summary": summary,
+            "start": {key: start},
+            "end": {key: end},
+            "status": "confirmed",
+            "htmlLink": f"https://calendar.google.com/event?eid={event_id}",
+            **extra,
+        }
+        with self.lock:
+            self.events[event_id] = event
+            self._touch(event_id)
+        return event
+
+    def update_event(self, event_id, summary, start, end):
+        with self.lock:
+            event = self.events[event_id]
+            event.update(summary=summary, start=start, end=end)
+            self._touch(event_id)
+        return event
+
+    def delete_event(self, event_id):
+        with self.lock:
+            self.events[event_id]["status"] = "cancelled"
+            self._touch(event_id)
+
+    def inject_faults(self, count, status=503, retry_after=None, after_commit=False):
+        # after_commit applies the write and then fails the response, like a reply lost on the way back.
+        with self.lock:
+            self.faults.extend([(status, retry_after, after_commit)] * count)
+
+    def next_fault(self):
+        with self.lock:
+            return self.faults.popleft() if self.faults else None
+
+    def random_error(self):
+        if not self.error_rate:
+            return False
+        with self.lock:
+            return self.random.random() < self.error_rate
+
+    def expire_sync_tokens(self):
+        # Makes every outstanding sync token answer 410 Gone.
+        with self.lock:
+            self.token_floor = self.seq + 1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    prefix = "/calendar/v3/"
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _reply(self, status, payload=None, headers=None, content_type="application/json"):
+        if isinstance(payload, bytes):
+            data = payload
+        else:
+            data = json.dumps(payload).encode() if payload is not None else b""
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if data:
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _route(self, method):
+        self.state.requests += 1
+        if self.state.latency:
+            time.sleep(self.state.latency)
+        raw = self._body()
+        if method == "POST" and urlparse(self.path).path == "/batch/calendar/v3":
+            body, content_type = self._batch(raw)
+            return self._reply(200, body, content_type=content_type)
+        return self._reply(*self._dispatch(method, self.path, json.loads(raw) if raw else {}))
+
+    def _batch(self, raw):
+        # One multipart/mixed POST carrying many application/http parts, answered in kind.
+        message = BytesParser().parsebytes(
+            b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + raw
+        )
+        boundary = uuid.uuid4().hex
+        out = []
+        for part in message.get_payload():
+            head, _, body = part.get_payload().replace("\r\n", "\n").partition("\n\n")
+            method, path, _ = head.split("\n", 1)[0].split(" ", 2)
+            status, payload, *extra = self._dispatch(method, path, json.loads(body) if body.strip() else {})
+            headers = "".join(f"{name}: {value}\r\n" for name, value in (extra[0] if extra else {}).items())
+            content = json.dumps(payload) if payload is not None else ""
+            content_id = part["Content-ID"].strip("<>")
+            out.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n{headers}Content-Type: application/json\r\n"
+                f"Content-Length: {len(content)}\r\n\r\n{content}\r\n"
+            )
+        out.append(f"--{boundary}--\r\n")
+        return "".join(out).encode(), f"multipart/mixed; boundary={boundary}"
+
+    def _dispatch(self, method, path, body):
+        if self.state.random_error():
+            return 503, {"error": {"code": 503, "message": "backendError", "errors": [{"reason": "backendError"}]}}
+        if method in ("POST", "PUT", "DELETE") and "/events" in path:
+            fault = self.state.next_fault()
+            if fault:
+                status, retry_after, after_commit = fault
+                if after_commit:
+                    self._apply(method, path, body)
+                headers = {"Retry-After": str(retry_after)} if retry_after is not None else {}
+                reason = "rateLimitExceeded" if status in (403, 429) else "backendError"
+                return status, {"error": {"code": status, "message": reason, "errors": [{"reason": reason}]}}, headers
+        return self._apply(method, path, body)
+
+    def _apply(self, method, path, body):
+        url = urlparse(path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if method == "POST" and url.path == self.prefix + "freeBusy":
+            return 200, self._free_busy(body)
+        parts = url.path[len(self.prefix):].strip("/").split("/")
+        if not url.path.startswith(self.prefix) or len(parts) < 3 or parts[2] != "events":
+            return 404, {"error": {"code": 404, "message": "Not Found"}}
+        event_id = parts[3] if len(parts) > 3 else None
+        if method == "GET" and event_id is None:
+            return self._list(query)
+        if method == "POST" and event_id is None:
+            with self.state.lock:
+                existing = self.state.events.get(body.get("id"))
+            if existing is not None and existing["status"] != "cancelled":
+                return 409, {"error": {"code": 409, "message": "The requested identifier already exists.",
+                                       "errors": [{"reason": "duplicate"}]}}
+            self.state.inserts_applied += 1
+            event = self.state.add_event(
+                body.get("summary"),
+                body["start"].get("dateTime"),
+                body["end"].get("dateTime"),
+                event_id=body.get("id"),
+            )
+            return 200, event
+        with self.state.lock:
+            event = self.state.events.get(event_id)
+        if event is None or event["status"] == "cancelled":
+            return 404, {"error": {"code": 404, "message": "Not Found"}}
+        if method == "GET":
+            return 200, event
+        if method == "PUT":
+            return 200, self.state.update_event(event_id, body.get("summary"), body["start"], body["end"])
+        if method == "DELETE":
+            self.state.delete_event(event_id)
+            return 204, None
+        return 405, {"error": {"code": 405, "message": "Method Not Allowed"}}
+
+    def _list(self, query):
+        time_min = query.get("timeMin")
+        time_max = query.get("timeMax")
+        with self.state.lock:
+            items = list(self.state.events.values())
+            changed_at = dict(self.state.changed_at)
+            seq = self.state.seq
+            token_floor = self.state.token_floor
+        if "syncToken" in query:
+            since = int(query["syncToken"])
+            if since < token_floor:
+                return 410, {"error": {"code": 410, "message": "Sync token is no longer valid, a full sync is required."}}
+            items = [e for e in items if changed_at[e["id"]] > since]
+        else:
+            items = [e for e in items if e["status"] != "cancelled"]
+            if time_min:
+                items = [e for e in items if _when(e["end"]) > time_min]
+            if time_max:
+                items = [e for e in items if _when(e["start"]) < time_max]
+        items.sort(key=lambda e: _when(e["start"]))
+        offset = int(query.get("pageToken") or 0)
+        page_size = int(query.get("maxResults") or 250)
+        page = items[offset:offset + page_size]
+        projection = re.search(r"items\(([^)]*)\)", query.get("fields", ""))
+        if projection:
+            keep = projection[1].split(",")
+            page = [{k: v for k, v in e.items() if k in keep} for e in page]
+        response = {"kind": "calendar#events", "items": page}
+        if offset + page_size < len(items):
+            response["nextPageToken"] = str(offset + page_size)
+        else:
+            response["nextSyncToken"] = str(seq)
+        return 200, response
+
+    def _free_busy(self, body):
+        time_min, time_max = body["timeMin"], body["timeMax"]
+        calendars = {}
+        for item in body.get("items", []):
+            calendar_id = item["id"]
+            if calendar_id == "primary":
+                with self.state.lock:
+                    events = [e for e in self.state.events.values() if e["status"] != "cancelled"]
+                busy = [{"start": _when(e["start"]), "end": _when(e["end"])} for e in events]
+            elif calendar_id in self.state.calendar_busy:
+                busy = self.state.calendar_busy[calendar_id]
+            else:
+                calendars[calendar_id] = {"busy": [], "errors": [{"domain": "global", "reason": "notFound"}]}
+                continue
+            busy = [b for b in busy if b["end"] > time_min and b["start"] < time_max]
+            calendars[calendar_id] = {"busy": sorted(busy, key=lambda b: b["start"])}
+        return {"kind": "calendar#freeBusy", "timeMin": time_min, "timeMax": time_max, "calendars": calendars}
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def do_PUT(self):
+        self._route("PUT")
+
+    def do_DELETE(self):
+        self._route("DELETE")
+
+
+class _Server(ThreadingHTTPServer):
+    # The default listen backlog of 5 drops connections under bursts, and the client's SYN retry adds a full second.
+    request_queue_size = 128
+    daemon_threads = True
+
+
+class StubCalendarServer:
+    def __init__(self, latency=0.0, host="127.0.0.1", port=0, error_rate=0.0, seed=0):
+        self.state = StubCalendarState(latency=latency, error_rate=error_rate, seed=seed)
+        self._server = _Server((host, port), _Handler)
+        self._server.state = self.state
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_endpoint(self):
+        return f"{self.url}/calendar/v3/"
+
+    @property
+    def batch_uri(self):
+        return f"{self.url}/batch/calendar/v3"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def stub_credentials():
+    # Long-lived fake token so googleapiclient never tries to hit the real token endpoint.
+    return Credentials(
+        token="stub-access-token",
+        refresh_token="stub-refresh-token",
+        token_uri="https://oauth2.googleapis.com/token",
+        client_id="stub-client-id",
+        client_secret="stub-client-secret",
+        expiry=datetime.datetime.utcnow() + datetime.timedelta(days=1),
+    )
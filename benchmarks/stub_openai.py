@@ -0,0 +1,112 @@
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Minimal in-process stand-in for the OpenAI chat completions API.
+# Point the openai client at it with OPENAI_BASE_URL=stub.base_url (or base_url=...).
+
+
+class StubOpenAIState:
+    def __init__(self, responder, latency=0.0, error_rate=0.0, seed=0):
+        # responder(prompt) -> dict, returned as the JSON message content.
+        self.responder = responder
+        self.latency = latency
+        # Share of completions answered with a 429 or 500, which the openai client retries.
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def next_error(self):
+        with self.lock:
+            self.requests += 1
+            if self.error_rate and self.random.random() < self.error_rate:
+                self.errors += 1
+                return self.random.choice([429, 500])
+        return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def _reply(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            return self._reply(200, {"object": "list", "data": [{"id": "gpt-4", "object": "model", "owned_by": "stub"}]})
+        self._reply(404, {"error": {"message": "Not Found", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._reply(404, {"error": {"message": "Not Found", "type": "invalid_request_error"}})
+        if self.state.latency:
+            time.sleep(self.state.latency)
+        status = self.state.next_error()
+        if status:
+            kind = "rate_limit_exceeded" if status == 429 else "server_error"
+            return self._reply(status, {"error": {"message": kind, "type": kind, "code": kind}},
+                               headers={"retry-after-ms": "50"})
+        request = json.loads(raw)
+        prompt = request["messages"][-1]["content"]
+        content = json.dumps(self.state.responder(prompt))
+        self._reply(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(content.split()),
+                      "total_tokens": len(prompt.split()) + len(content.split())},
+        })
+
+
+class _Server(ThreadingHTTPServer):
+    # The default listen backlog of 5 drops connections under bursts, and the client's SYN retry adds a full second.
+    request_queue_size = 128
+    daemon_threads = True
+
+
+class StubOpenAIServer:
+    def __init__(self, responder, latency=0.0, error_rate=0.0, seed=0, host="127.0.0.1", port=0):
+        self.state = StubOpenAIState(responder, latency=latency, error_rate=error_rate, seed=seed)
+        self._server = _Server((host, port), _Handler)
+        self._server.state = self.state
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
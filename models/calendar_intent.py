@@ -1,14 +1,41 @@
 from uagents import Model
 
+class TimeSlot(Model):
+    start_time: str  # ISO format
+    end_time: str
+
+class EventSpec(Model):
+    title: str | None = None
+    start_time: str | None = None  # ISO format; first occurrence when rrule is set
+    end_time: str | None = None
+    rrule: str | None = None  # e.g. "FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR;COUNT=5", expanded by the calendar agent
+    status: str | None = None  # free, conflict, failed, created
+    message: str | None = None  # per-item result
+    event_id: str | None = None  # set once created
+
 class CalendarIntent(Model):
-    type: str  # create_event, read_events, update_event, delete_event
+    type: str  # create_event, create_events, read_events, update_event, delete_event, sync_calendar, find_slot, prefetch
     title: str | None = None
     start_time: str | None = None  # ISO format
     end_time: str | None = None
     event_id: str | None = None  # for update/delete
     message: str | None = None  # response message from calendar agent
-    access_token: str | None = None  # user-specific token
+    session_token: str | None = None  # opaque handle the calendar agent resolves to stored credentials
+    access_token: str | None = None  # user-specific token (inline alternative to session_token)
     refresh_token: str | None = None
     client_id: str | None = None
     client_secret: str | None = None
     status: str | None = None  # pending, conflict, confirmed
+    attendees: list[str] | None = None  # extra calendars/emails to check for find_slot
+    duration_minutes: int | None = None  # requested length for find_slot
+    work_hours: list[int] | None = None  # find_slot: [first hour, last hour) of the local working day, default [9, 17]
+    buffer_minutes: int | None = None  # find_slot: minimum gap to keep around existing events
+    slot_count: int | None = None  # find_slot: how many slots to offer, default 3
+    slots: list[TimeSlot] | None = None  # free windows found by find_slot or suggested on conflict
+    events: list[EventSpec] | None = None  # create_events: several events and/or recurrences in one intent
+    session_id: str | None = None  # UI session that issued the intent
+    intent_id: str | None = None  # unique per prompt, used to confirm/cancel a pending intent
+    request_id: str | None = None  # unique per UI submission, correlates the pushed result
+    more: bool | None = None  # set on streamed partial results; the final reply leaves it unset
+    trace_id: str | None = None  # ties the UI's and agents' timing spans for one prompt together
+    profile: bool | None = None  # cProfile this intent in the calendar agent
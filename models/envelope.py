@@ -0,0 +1,101 @@
+import datetime
+import json
+
+# Compact wire/storage form of a CalendarIntent dict, for the hops this repo owns on both ends
+# (agent -> UI result pushes and the pending store). uAgents messages keep the model's own JSON.
+CONTENT_TYPE = "application/vnd.calendar-intent+json"
+VERSION = 1
+
+# Credentials are resolved by the calendar agent from session_token and never leave it.
+SECRET_FIELDS = {"access_token", "refresh_token", "client_id", "client_secret", "session_token"}
+
+FIELD_KEYS = {
+    "type": "t",
+    "title": "ti",
+    "start_time": "s",
+    "end_time": "e",
+    "event_id": "id",
+    "message": "m",
+    "status": "st",
+    "attendees": "a",
+    "duration_minutes": "d",
+    "work_hours": "wh",
+    "buffer_minutes": "bm",
+    "slot_count": "sc",
+    "slots": "sl",
+    "events": "ev",
+    "rrule": "r",
+    "session_id": "sid",
+    "intent_id": "iid",
+    "request_id": "rid",
+    "session_token": "tok",
+    "more": "mo",
+    "trace_id": "tr",
+    "profile": "pr",
+}
+FIELD_NAMES = {key: name for name, key in FIELD_KEYS.items()}
+TIME_FIELDS = {"start_time", "end_time"}
+
+
+def encode_time(value):
+    # [epoch seconds, UTC offset in minutes]; the offset is None for naive times.
+    try:
+        dt = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return value
+    offset = None if dt.tzinfo is None else int(dt.utcoffset().total_seconds() // 60)
+    epoch = (dt if dt.tzinfo else dt.replace(tzinfo=datetime.timezone.utc)).timestamp()
+    return [int(epoch) if epoch.is_integer() else epoch, offset]
+
+
+def decode_time(value):
+    # Typed form back to a datetime; strings (unparseable on the way in) pass through.
+    if not isinstance(value, list):
+        return value
+    epoch, offset = value
+    if offset is None:
+        return datetime.datetime.fromtimestamp(epoch, datetime.timezone.utc).replace(tzinfo=None)
+    return datetime.datetime.fromtimestamp(epoch, datetime.timezone(datetime.timedelta(minutes=offset)))
+
+
+def _compact(data):
+    packed = {}
+    for name, value in data.items():
+        if value is None or name in SECRET_FIELDS:
+            continue
+        if name in TIME_FIELDS:
+            value = encode_time(value)
+        elif name in ("slots", "events"):
+            value = [_compact(item) for item in value]
+        packed[FIELD_KEYS.get(name, name)] = value
+    return packed
+
+
+def _expand(packed, typed):
+    data = {}
+    for key, value in packed.items():
+        name = FIELD_NAMES.get(key, key)
+        if name in TIME_FIELDS:
+            value = decode_time(value)
+            if not typed and isinstance(value, datetime.datetime):
+                value = value.isoformat()
+        elif name in ("slots", "events"):
+            value = [_expand(item, typed) for item in value]
+        data[name] = value
+    return data
+
+
+def pack(intent):
+    """Encode an intent (model or dict) as compact JSON bytes, without secrets or unset fields."""
+    data = intent.dict(exclude_none=True, exclude=SECRET_FIELDS) if hasattr(intent, "dict") else intent
+    return json.dumps({"v": VERSION, **_compact(data)}, separators=(",", ":")).encode()
+
+
+def unpack(raw, typed=False):
+    """Decode pack() output back to an intent dict; typed=True leaves start/end times as datetimes.
+
+    Plain intent JSON (full field names, ISO strings) decodes unchanged, so older records still load.
+    """
+    packed = json.loads(raw)
+    packed.pop("v", None)
+    return _expand(packed, typed)
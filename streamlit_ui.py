@@ -1,13 +1,21 @@
 import streamlit as st
 import json
 import os
-import requests
 import datetime
-import openai
-from google_auth_oauthlib.flow import Flow
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from models.calendar_intent import CalendarIntent
+import hashlib
+import logging
+import time
+from ui.intent_resolver import IntentResolver
+from agents.credential_store import open_credential_store
+from agents.shard_ring import user_key
+from agents.rate_governor import RateLimited, open_governor
+from agents.telemetry import Trace, activate, current_trace, span
+from agents.pending_store import open_pending_store, hold_for_confirmation
+from ui.result_hub import ResultHub, DEFAULT_PORT, merge_chunks
+from ui.agent_client import AgentClient
+import uuid
+
+render_started = time.perf_counter()
 
 # Page configuration
 st.set_page_config(
@@ -54,9 +62,14 @@ if "messages" not in st.session_state:
     st.session_state.messages = []
 if "pending_intent" not in st.session_state:
     st.session_state.pending_intent = None
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 
 # Function to create OAuth flow
 def create_flow():
+    # Imported here so the landing page never loads the Google auth stack
+    from google_auth_oauthlib.flow import Flow
+    
     # Get the base URL for your Streamlit app
     # For local development this will be http://localhost:8501
     # For deployed apps, this will be your app's URL
@@ -86,6 +99,189 @@ def create_flow():
         redirect_uri=redirect_uri
     )
 
+def key_hash(api_key):
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+# One OpenAI client (and connection pool) per key, imported only once a key is entered
+@st.cache_resource(show_spinner=False)
+def get_openai_client(api_key_hash, _api_key):
+    import openai
+    return openai.OpenAI(api_key=_api_key)
+
+# Each OpenAI key is its own account with its own quota, so each gets its own governor, whichever tabs share it
+@st.cache_resource(max_entries=1000)
+def get_openai_governor(api_key_hash):
+    return open_governor("OPENAI", user_rate=0.5, user_burst=5, project_rate=5, project_burst=20)
+
+# Function to turn a prompt into a structured intent with the LLM
+def parse_intent_with_llm(prompt):
+    client = get_openai_client(key_hash(st.session_state.openai_key), st.session_state.openai_key)
+    response = client.chat.completions.create(
+        model="gpt-4",  # Use appropriate model
+        messages=[
+            {"role": "system", "content": """
+            You are a calendar assistant that converts natural language into structured calendar intents.
+            Extract the relevant details and format them as JSON with these fields:
+            - type: create_event, create_events, read_events, update_event, delete_event, find_slot
+            - title: Event title/summary
+            - start_time: ISO formatted datetime (with timezone)
+            - end_time: ISO formatted datetime (with timezone)
+            - event_id: For update/delete operations
+            - attendees: For find_slot, list of other people's email addresses to check
+            - duration_minutes: For find_slot, length of the meeting being looked for
+            - work_hours: For find_slot, only when the user names a time of day to search, as [start_hour, end_hour] in 24h local time
+            - buffer_minutes: For find_slot, only when the user wants a gap kept before and after other events
+            - slot_count: For find_slot, only when the user asks for a specific number of options
+            - events: For create_events, a list of {title, start_time, end_time, rrule}; rrule is an optional
+              RFC 5545 rule such as "FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR;COUNT=5" and start_time/end_time are the first occurrence
+            
+            If the request is to create an event, assume it's 1 hour long by default unless specified.
+            Use create_events when one message asks for several events or a repeating event.
+            Use find_slot when the user asks when they (and others) are free; start_time/end_time bound the search.
+            For read_events, set start_time/end_time only when the user asks about a specific period ("next month").
+            Use America/Los_Angeles timezone unless otherwise specified.
+            """},
+            {"role": "user", "content": prompt},
+        ],
+        temperature=0,
+        response_format={"type": "json_object"}
+    )
+    
+    # Parse the structured intent
+    return json.loads(response.choices[0].message.content)
+
+# Pending intents written by the frontend agent, keyed by this browser session
+@st.cache_resource
+def get_pending_store():
+    return open_pending_store()
+
+# Agents push finished intents here; the session waiting on a request_id is woken immediately
+@st.cache_resource
+def get_result_hub():
+    hub = ResultHub()
+    hub.serve(port=int(os.environ.get("RESULT_HUB_PORT", DEFAULT_PORT)))
+    return hub
+
+# Credentials shared with the calendar agent, which resolves the opaque session token
+@st.cache_resource
+def get_credential_store():
+    return open_credential_store()
+
+# Handle for this session's Google credentials; re-registered if it expired
+def session_token():
+    token = st.session_state.get("session_token")
+    if token is None or get_credential_store().resolve(token) is None:
+        credentials = st.session_state.credentials
+        token = get_credential_store().register({
+            "access_token": credentials["token"],
+            "refresh_token": credentials["refresh_token"],
+            "client_id": credentials["client_id"],
+            "client_secret": credentials["client_secret"],
+        })
+        st.session_state.session_token = token
+    return token
+
+# Picks this user's calendar agent shard
+def route_key():
+    return user_key(st.session_state.credentials["client_id"], st.session_state.credentials["refresh_token"])
+
+# One pooled keep-alive client for all agent submissions from this Streamlit process
+@st.cache_resource
+def get_agent_client():
+    return AgentClient()
+
+RESULT_TIMEOUT = 20  # seconds to wait for an agent before telling the user it's still working
+
+# Record an agent result in the chat (and hold it for confirmation if needed)
+def record_agent_result(result):
+    if result.get("status") == "pending":
+        hold_for_confirmation(get_pending_store(), result)
+    st.session_state.messages.append({
+        "role": "assistant",
+        "content": result.get("message") or "✅ Done."
+    })
+
+# One logfmt line per prompt with every UI stage; the agents log theirs under the same trace_id
+def log_trace(trace):
+    if trace is not None:
+        logging.getLogger(__name__).info(trace.summary())
+
+# Block this rerun until the agent answers request_id (or the timeout passes), then redraw
+def await_agent_result(request_id, waiting_message, trace=None):
+    with activate(trace), span("await_result"), st.spinner(waiting_message):
+        result = get_result_hub().wait(request_id, timeout=RESULT_TIMEOUT)
+    if result is None:
+        st.session_state.messages.append({
+            "role": "assistant",
+            "content": f"{waiting_message} The answer will show up here when it's ready."
+        })
+    else:
+        record_agent_result(result)
+    log_trace(trace)
+    st.rerun()
+
+# Show streamed chunks for request_id as they arrive (read_events), then keep the whole answer in the history
+def stream_agent_result(request_id, waiting_message, trace=None):
+    chunks = []
+    def text():
+        for chunk in get_result_hub().stream(request_id, timeout=RESULT_TIMEOUT):
+            chunks.append(chunk)
+            if chunk.get("message"):
+                yield chunk["message"] + "\n"
+    with activate(trace), span("stream_result"), st.chat_message("assistant"):
+        with st.spinner(waiting_message):
+            st.write_stream(text())
+    if chunks and not chunks[-1].get("more"):
+        record_agent_result(merge_chunks(chunks))
+    else:
+        shown = "\n".join(chunk["message"] for chunk in chunks if chunk.get("message"))
+        st.session_state.messages.append({
+            "role": "assistant",
+            "content": f"{shown}\n{waiting_message} The rest will show up here when it's ready.".strip()
+        })
+    log_trace(trace)
+    st.rerun()
+
+# The LLM fallback, admitted by the OpenAI governor and timed as its own stage
+def governed_llm(prompt):
+    with span("quota"):
+        api_key_hash = key_hash(st.session_state.openai_key)
+        get_openai_governor(api_key_hash).acquire_blocking(api_key_hash)
+    with span("llm"):
+        return parse_intent_with_llm(prompt)
+
+# While the LLM parses a scheduling prompt, have the user's calendar agent warm the busy blocks for the day it
+# probably names, so the conflict check that follows doesn't pay for the load
+def speculative_prefetch(start, end):
+    if not st.session_state.credentials:
+        return
+    with span("prefetch"):
+        get_agent_client().prefetch({
+            "type": "prefetch",
+            "start_time": start.isoformat(),
+            "end_time": end.isoformat(),
+            "session_token": session_token(),
+            "session_id": st.session_state.session_id,
+            "trace_id": getattr(current_trace.get(), "trace_id", None),
+        }, route_key())
+
+# Rules and a prompt cache answer repeated/simple commands before falling back to the LLM
+@st.cache_resource
+def get_intent_resolver():
+    speculate = speculative_prefetch if os.environ.get("SPECULATIVE_PREFETCH", "1") == "1" else None
+    return IntentResolver(governed_llm, speculate=speculate)
+
+# Validate an OpenAI key once per key (cached by its hash) with a call that costs no tokens.
+# Only a definite "invalid key" answer is cached; network errors raise and are retried next rerun.
+@st.cache_data(ttl=3600, show_spinner=False)
+def validate_openai_key(api_key_hash, _api_key):
+    import openai
+    try:
+        get_openai_client(api_key_hash, _api_key).models.list()
+        return True, None
+    except openai.AuthenticationError as e:
+        return False, str(e)
+
 # Sidebar for authentication
 with st.sidebar:
     st.title("🔐 Authentication")
@@ -96,16 +292,14 @@ with st.sidebar:
     if openai_key:
         st.session_state.openai_key = openai_key
         try:
-            openai.api_key = openai_key
-            # Minimal test to validate API key
-            openai.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": "test"}],
-                max_tokens=5
-            )
-            st.success("✅ OpenAI API Key valid")
+            valid, error = validate_openai_key(key_hash(openai_key), openai_key)
+            if valid:
+                st.success("✅ OpenAI API Key valid")
+            else:
+                st.error(f"❌ OpenAI API Key invalid: {error}")
+                st.session_state.openai_key = ""
         except Exception as e:
-            st.error(f"❌ OpenAI API Key invalid: {str(e)}")
+            st.error(f"❌ Could not validate OpenAI API Key: {str(e)}")
             st.session_state.openai_key = ""
     
     # Google OAuth
@@ -127,6 +321,9 @@ with st.sidebar:
         if st.button("Logout"):
             st.session_state.authenticated = False
             st.session_state.credentials = None
+            if st.session_state.get("session_token"):
+                get_credential_store().revoke(st.session_state.session_token)
+                st.session_state.session_token = None
             st.experimental_rerun()
 
 # Check for OAuth callback
@@ -159,7 +356,8 @@ if "code" in query_params and not st.session_state.authenticated:
         }
         
         # Test credentials
-        service = build("calendar", "v3", credentials=creds)
+        from googleapiclient.discovery import build
+        service = build("calendar", "v3", credentials=creds, cache_discovery=False)
         now = datetime.datetime.utcnow().isoformat() + "Z"
         service.events().list(calendarId='primary', timeMin=now, maxResults=1).execute()
         
@@ -179,66 +377,76 @@ st.title("📅 AI Calendar Assistant")
 # Only show chat interface if authenticated
 if st.session_state.get("authenticated", False) and st.session_state.openai_key:
     # Display chat messages
+    # Pick up results that arrived after their request stopped waiting
+    for result in get_result_hub().collect(st.session_state.session_id):
+        record_agent_result(result)
+    
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
             st.write(message["content"])
     
-    # Check for pending intents from file
+    # Check for pending intents for this session
     try:
-        if os.path.exists("pending_intent.json"):
-            with open("pending_intent.json", "r") as f:
-                intent_data = json.load(f)
-                st.session_state.pending_intent = intent_data
-                
-                # Display the pending intent
-                with st.container():
-                    st.subheader("🔔 Pending Calendar Action")
+        pending = get_pending_store().get(st.session_state.session_id)
+        if pending:
+            intent_id, intent_data = next(iter(pending.items()))
+            st.session_state.pending_intent = intent_data
+            
+            # Display the pending intent
+            with st.container():
+                st.subheader("🔔 Pending Calendar Action")
+                if intent_data.get("events"):
+                    free = [item for item in intent_data["events"] if item.get("status") == "free"]
+                    st.write(f"**Events:** {len(free)} to book")
+                    for item in free:
+                        start = datetime.datetime.fromisoformat(item['start_time'].replace('Z', '+00:00'))
+                        end = datetime.datetime.fromisoformat(item['end_time'].replace('Z', '+00:00'))
+                        st.write(f"- {item.get('title')}: {start.strftime('%A, %B %d, %Y')} from {start.strftime('%I:%M %p')} to {end.strftime('%I:%M %p')}")
+                else:
                     st.write(f"**Event:** {intent_data.get('title')}")
                     start = datetime.datetime.fromisoformat(intent_data.get('start_time').replace('Z', '+00:00'))
                     end = datetime.datetime.fromisoformat(intent_data.get('end_time').replace('Z', '+00:00'))
                     st.write(f"**When:** {start.strftime('%A, %B %d, %Y')} from {start.strftime('%I:%M %p')} to {end.strftime('%I:%M %p')}")
-                    
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        if st.button("✅ Confirm", key="confirm_intent"):
-                            # Add credentials to the intent
+                
+                col1, col2 = st.columns(2)
+                with col1:
+                    if st.button("✅ Confirm", key=f"confirm_{intent_id}"):
+                        # Claim first so a double click (or a second tab) can't book twice
+                        intent_data = get_pending_store().claim(st.session_state.session_id, intent_id)
+                        if intent_data is None:
+                            st.warning("This request was already handled or has expired.")
+                        else:
+                            # Credentials travel by reference
+                            # The confirmation continues the trace the check started
+                            trace = Trace(intent_data.get("trace_id"), type="confirm")
                             intent_data.update({
-                                "access_token": st.session_state.credentials["token"],
-                                "refresh_token": st.session_state.credentials["refresh_token"],
-                                "client_id": st.session_state.credentials["client_id"],
-                                "client_secret": st.session_state.credentials["client_secret"],
+                                "session_token": session_token(),
+                                "request_id": uuid.uuid4().hex,
+                                "trace_id": trace.trace_id,
                             })
+                            get_result_hub().expect(intent_data["request_id"])
                             
                             # Send to calendar agent
-                            response = requests.post(
-                                "http://localhost:8001/submit",
-                                json={
-                                    "sender": "frontend_agent",
-                                    "message": intent_data
-                                }
-                            )
+                            with activate(trace), span("submit"):
+                                response = get_agent_client().submit_to_calendar(intent_data, route_key())
                             
                             if response.status_code == 200:
-                                st.session_state.messages.append({
-                                    "role": "assistant",
-                                    "content": "✅ Event has been confirmed and added to your calendar!"
-                                })
-                                # Remove the pending intent file
-                                os.remove("pending_intent.json")
                                 st.session_state.pending_intent = None
-                                st.rerun()
+                                await_agent_result(intent_data["request_id"], "⏳ Adding the event to your calendar...", trace)
                             else:
+                                # Put it back so the user can retry
+                                get_pending_store().put(st.session_state.session_id, intent_id, st.session_state.pending_intent)
                                 st.error(f"Failed to confirm: {response.text}")
-                    
-                    with col2:
-                        if st.button("❌ Cancel", key="cancel_intent"):
-                            os.remove("pending_intent.json")
-                            st.session_state.pending_intent = None
-                            st.session_state.messages.append({
-                                "role": "assistant",
-                                "content": "Event cancelled. What would you like to do instead?"
-                            })
-                            st.rerun()
+                
+                with col2:
+                    if st.button("❌ Cancel", key=f"cancel_{intent_id}"):
+                        get_pending_store().discard(st.session_state.session_id, intent_id)
+                        st.session_state.pending_intent = None
+                        st.session_state.messages.append({
+                            "role": "assistant",
+                            "content": "Event cancelled. What would you like to do instead?"
+                        })
+                        st.rerun()
     except Exception as e:
         st.error(f"Error processing pending intent: {str(e)}")
     
@@ -254,67 +462,36 @@ if st.session_state.get("authenticated", False) and st.session_state.openai_key:
         # Process with OpenAI to get structured intent
         with st.spinner("Processing your request..."):
             try:
-                response = openai.chat.completions.create(
-                    model="gpt-4",  # Use appropriate model
-                    messages=[
-                        {"role": "system", "content": """
-                        You are a calendar assistant that converts natural language into structured calendar intents.
-                        Extract the relevant details and format them as JSON with these fields:
-                        - type: create_event, read_events, update_event, delete_event
-                        - title: Event title/summary
-                        - start_time: ISO formatted datetime (with timezone)
-                        - end_time: ISO formatted datetime (with timezone)
-                        - event_id: For update/delete operations
-                        
-                        If the request is to create an event, assume it's 1 hour long by default unless specified.
-                        Use America/Los_Angeles timezone unless otherwise specified.
-                        """},
-                        {"role": "user", "content": prompt},
-                    ],
-                    temperature=0,
-                    response_format={"type": "json_object"}
-                )
-                
-                # Parse the structured intent
-                intent_data = json.loads(response.choices[0].message.content)
+                trace = Trace(type="prompt")
+                with activate(trace), span("resolve"):
+                    intent_data = get_intent_resolver().resolve(prompt)
+                intent_data.update({
+                    "session_id": st.session_state.session_id,
+                    "intent_id": uuid.uuid4().hex,
+                    "request_id": uuid.uuid4().hex,
+                    "trace_id": trace.trace_id,
+                })
+                trace.labels["type"] = intent_data.get("type")
+                # ?profile=1 in the page URL runs each intent under cProfile in the calendar agent
+                if st.query_params.get("profile"):
+                    intent_data["profile"] = True
+                get_result_hub().expect(intent_data["request_id"])
                 
                 # Process different intent types
-                if intent_data.get("type") == "create_event":
-                    # Add credentials to the intent
+                if intent_data.get("type") in ("create_event", "create_events"):
+                    # Credentials travel by reference
                     intent_data.update({
-                        "access_token": st.session_state.credentials["token"],
-                        "refresh_token": st.session_state.credentials["refresh_token"],
-                        "client_id": st.session_state.credentials["client_id"],
-                        "client_secret": st.session_state.credentials["client_secret"],
+                        "session_token": session_token(),
                         "status": "pending_check"
                     })
                     
-                    # Send to frontend agent
-                    response = requests.post(
-                        "http://localhost:8000/submit",
-                        json={
-                            "sender": "calendar_agent",
-                            "message": intent_data
-                        }
-                    )
+                    # Send to the frontend agent and the calendar agent (conflict check) in parallel
+                    with activate(trace), span("submit"):
+                        frontend_response, response = get_agent_client().submit_both(intent_data, route_key())
                     
-                    if response.status_code == 200:
-                        # Forward to calendar agent to check conflicts
-                        response = requests.post(
-                            "http://localhost:8001/submit",
-                            json={
-                                "sender": "frontend_agent",
-                                "message": intent_data
-                            }
-                        )
-                        
+                    if frontend_response.status_code == 200:
                         if response.status_code == 200:
-                            with st.chat_message("assistant"):
-                                st.write("⏳ Checking your calendar for conflicts...")
-                            st.session_state.messages.append({
-                                "role": "assistant",
-                                "content": "⏳ Checking your calendar for conflicts..."
-                            })
+                            await_agent_result(intent_data["request_id"], "⏳ Checking your calendar for conflicts...", trace)
                         else:
                             with st.chat_message("assistant"):
                                 st.write(f"❌ Error: {response.text}")
@@ -324,37 +501,25 @@ if st.session_state.get("authenticated", False) and st.session_state.openai_key:
                             })
                     else:
                         with st.chat_message("assistant"):
-                            st.write(f"❌ Error: {response.text}")
+                            st.write(f"❌ Error: {frontend_response.text}")
                         st.session_state.messages.append({
                             "role": "assistant",
-                            "content": f"❌ Error: {response.text}"
+                            "content": f"❌ Error: {frontend_response.text}"
                         })
                 
-                elif intent_data.get("type") == "read_events":
-                    # Add credentials to the intent
-                    intent_data.update({
-                        "access_token": st.session_state.credentials["token"],
-                        "refresh_token": st.session_state.credentials["refresh_token"],
-                        "client_id": st.session_state.credentials["client_id"],
-                        "client_secret": st.session_state.credentials["client_secret"],
-                    })
+                elif intent_data.get("type") in ("read_events", "find_slot"):
+                    # Credentials travel by reference
+                    intent_data["session_token"] = session_token()
                     
                     # Send directly to calendar agent
-                    response = requests.post(
-                        "http://localhost:8001/submit",
-                        json={
-                            "sender": "frontend_agent",
-                            "message": intent_data
-                        }
-                    )
+                    with activate(trace), span("submit"):
+                        response = get_agent_client().submit_to_calendar(intent_data, route_key())
                     
                     if response.status_code == 200:
-                        with st.chat_message("assistant"):
-                            st.write("⏳ Fetching your calendar events...")
-                        st.session_state.messages.append({
-                            "role": "assistant",
-                            "content": "⏳ Fetching your calendar events..."
-                        })
+                        if intent_data["type"] == "read_events":
+                            stream_agent_result(intent_data["request_id"], "⏳ Fetching your calendar events...", trace)
+                        else:
+                            await_agent_result(intent_data["request_id"], "⏳ Looking for free time...", trace)
                     else:
                         with st.chat_message("assistant"):
                             st.write(f"❌ Error: {response.text}")
@@ -363,6 +528,14 @@ if st.session_state.get("authenticated", False) and st.session_state.openai_key:
                             "content": f"❌ Error: {response.text}"
                         })
             
+            except RateLimited:
+                with st.chat_message("assistant"):
+                    st.write("⏳ Too many requests right now. Please wait a moment and try again.")
+                st.session_state.messages.append({
+                    "role": "assistant",
+                    "content": "⏳ Too many requests right now. Please wait a moment and try again."
+                })
+
             except Exception as e:
                 with st.chat_message("assistant"):
                     st.write(f"❌ Error: {str(e)}")
@@ -390,4 +563,10 @@ else:
     - "Show me my upcoming events"
     - "Book a dentist appointment next Monday at 10AM"
     - "Reschedule my meeting with John to Friday"
-    """)
\ No newline at end of file
+    - "When are alex@example.com and I both free for 30 minutes this week?"
+    """)
+
+# Page render time, to keep an eye on per-rerun cost
+render_ms = (time.perf_counter() - render_started) * 1000
+logging.getLogger(__name__).info(f"Rendered in {render_ms:.1f} ms")
+st.sidebar.caption(f"⏱️ Rendered in {render_ms:.0f} ms")
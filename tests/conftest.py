@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.service_cache import build_calendar_service
+from benchmarks.stub_calendar import StubCalendarServer, stub_credentials
+
+
+@pytest.fixture
+def stub():
+    with StubCalendarServer() as server:
+        yield server
+
+
+@pytest.fixture
+def service(stub):
+    return build_calendar_service(stub_credentials(), client_options={"api_endpoint": stub.api_endpoint})
@@ -0,0 +1,21 @@
+import asyncio
+
+from agents.batch_writer import BatchWriter
+
+
+def test_in_flight_flushes_are_held_until_they_finish(stub, service):
+    stub.state.latency = 0.05
+    writer = BatchWriter(window=0.005, batch_uri=stub.batch_uri)
+    body = {"summary": "Standup", "start": {"dateTime": "2030-01-07T09:00:00Z"}, "end": {"dateTime": "2030-01-07T09:30:00Z"}}
+
+    async def run():
+        pending = asyncio.ensure_future(writer.submit("user-1", service, service.events().insert(calendarId="primary", body=body)))
+        await asyncio.sleep(0.02)
+        held = len(writer._flushes)
+        event = await pending
+        return held, event
+
+    held, event = asyncio.run(run())
+    assert held == 1 and event["summary"] == "Standup"
+    assert writer._flushes == set()
+    assert writer.stats == {"requests": 1, "batches": 1}
@@ -0,0 +1,32 @@
+import datetime
+from zoneinfo import ZoneInfo
+
+from agents.busy_index import DEFAULT_TIME_ZONE, BusyIndexCache, to_timestamp
+from agents.slot_finder import to_datetime
+
+USER = "user-1"
+
+
+def local_slot(days, hour):
+    # A wall-clock time in the calendar's zone, with and without its UTC offset.
+    day = datetime.datetime.now(ZoneInfo(DEFAULT_TIME_ZONE)).date() + datetime.timedelta(days=days)
+    start = datetime.datetime.combine(day, datetime.time(hour), ZoneInfo(DEFAULT_TIME_ZONE))
+    end = start + datetime.timedelta(hours=1)
+    return (start.isoformat(), end.isoformat()), (start.replace(tzinfo=None).isoformat(), end.replace(tzinfo=None).isoformat())
+
+
+def test_time_without_offset_is_read_in_the_calendar_time_zone():
+    assert to_timestamp("2030-01-07T09:00:00") == to_timestamp("2030-01-07T09:00:00-08:00")
+    assert to_timestamp("2030-07-07T09:00:00") == to_timestamp("2030-07-07T09:00:00-07:00")
+    assert to_timestamp({"dateTime": "2030-01-07T09:00:00", "timeZone": "UTC"}) == to_timestamp("2030-01-07T09:00:00Z")
+    assert to_datetime("2030-01-07T09:00:00") == to_datetime("2030-01-07T17:00:00Z")
+
+
+def test_conflict_check_without_offset_finds_stored_event_with_offset():
+    (start, end), (naive_start, naive_end) = local_slot(2, 9)
+    (_, _), (later_start, later_end) = local_slot(2, 13)
+    event = {"id": "standup", "summary": "Standup", "start": {"dateTime": start}, "end": {"dateTime": end}}
+    cache = BusyIndexCache(loader=lambda user_key, service, time_min, time_max: [event])
+
+    assert [block.event_id for block in cache.conflicts(USER, None, naive_start, naive_end)] == ["standup"]
+    assert cache.conflicts(USER, None, later_start, later_end) == []
@@ -0,0 +1,100 @@
+import datetime
+import os
+
+import pytest
+
+from agents.calendar_sync import CalendarSync
+from agents.event_store import EventStore
+from agents.rate_governor import RateGovernor
+
+USER = "user-1"
+
+
+def at(hours):
+    start = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0) + datetime.timedelta(hours=hours)
+    return start.isoformat(), (start + datetime.timedelta(minutes=30)).isoformat()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return EventStore(os.path.join(tmp_path, "calendar_store.db"))
+
+
+@pytest.fixture
+def sync(store):
+    return CalendarSync(store, min_interval=0)
+
+
+def stored(store):
+    return {event["id"]: event for event in store.events_between(USER, 0, float("inf"))}
+
+
+def test_full_sync_stores_events_and_next_sync_token(stub, service, store, sync):
+    stub.state.add_event("Standup", *at(1), event_id="standup")
+    stub.state.add_event("Review", *at(3), event_id="review")
+
+    sync.sync(USER, service)
+
+    assert set(stored(store)) == {"standup", "review"}
+    sync_token, _, _ = store.get_sync_state(USER)
+    assert sync_token == str(stub.state.seq)
+    assert sync.stats == {"full_syncs": 1, "incremental_syncs": 0, "gone": 0}
+
+
+def test_incremental_sync_applies_delta_including_cancellations(stub, service, store, sync):
+    stub.state.add_event("Standup", *at(1), event_id="standup")
+    stub.state.add_event("Review", *at(3), event_id="review")
+    sync.sync(USER, service)
+
+    start, end = at(5)
+    stub.state.update_event("standup", "Standup (moved)", {"dateTime": start}, {"dateTime": end})
+    stub.state.delete_event("review")
+    stub.state.add_event("Lunch", *at(7), event_id="lunch")
+    sync.sync(USER, service)
+
+    events = stored(store)
+    assert set(events) == {"standup", "lunch"}
+    assert events["standup"]["summary"] == "Standup (moved)"
+    assert store.get_sync_state(USER)[0] == str(stub.state.seq)
+    assert sync.stats == {"full_syncs": 1, "incremental_syncs": 1, "gone": 0}
+
+
+def test_expired_sync_token_falls_back_to_full_sync(stub, service, store, sync):
+    stub.state.add_event("Standup", *at(1), event_id="standup")
+    sync.sync(USER, service)
+
+    stub.state.expire_sync_tokens()
+    stub.state.delete_event("standup")
+    stub.state.add_event("Lunch", *at(7), event_id="lunch")
+    sync.sync(USER, service)
+
+    assert set(stored(store)) == {"lunch"}
+    assert store.get_sync_state(USER)[0] == str(stub.state.seq)
+    assert sync.stats == {"full_syncs": 2, "incremental_syncs": 0, "gone": 1}
+
+    # The fresh token works again for deltas.
+    sync.sync(USER, service)
+    assert sync.stats["incremental_syncs"] == 1
+
+
+def test_quota_is_charged_per_page_fetched_not_per_local_read(stub, service, store):
+    governor = RateGovernor("google", user_rate=1000, user_burst=1000, project_rate=1000, project_burst=1000)
+    sync = CalendarSync(store, min_interval=60, governor=governor)
+    for i in range(600):
+        stub.state.add_event(f"Event {i}", *at(1 + i / 10))
+    granted = lambda: governor.metrics()["granted"]
+
+    sync.sync(USER, service)
+    assert granted() == 3  # 600 events at 250 per page
+
+    # Inside the synced window and min_interval: answered from the store, no Google call, no charge.
+    start, _ = at(1)
+    _, end = at(20)
+    assert len(sync.load_window(USER, service, start, end)) > 100
+    assert granted() == 3
+
+    # Older than the synced window: pulled live from Google, a page at a time.
+    old_start, _ = at(-24 * 60)
+    _, old_end = at(-24 * 59)
+    pages = list(sync.iter_window(USER, service, old_start, old_end, page_size=50))
+    assert pages == [[]] and granted() == 4
@@ -0,0 +1,20 @@
+from ui import result_hub
+from ui.result_hub import RESULT_RETENTION, ResultHub
+
+
+def test_requests_that_never_get_a_result_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_hub.time, "monotonic", lambda: now[0])
+    hub = ResultHub()
+    hub.expect("lost")
+    hub.expect("late")
+    assert hub.wait("lost", timeout=0) is None
+
+    now[0] += RESULT_RETENTION / 2
+    hub.publish({"request_id": "late", "message": "done"})
+    assert "late" not in hub._started and list(hub.latencies) == [RESULT_RETENTION / 2]
+
+    now[0] += RESULT_RETENTION + 1
+    hub.expect("next")
+    assert set(hub._started) == {"next"}
+    assert hub._results == {}
@@ -0,0 +1,27 @@
+import asyncio
+import logging
+
+from agents import telemetry
+from agents.telemetry import profiled
+
+
+def test_overlapping_profiles_run_one_at_a_time(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(telemetry, "PROFILE_DIR", str(tmp_path))
+    seen = {}
+
+    async def intent(name, delay):
+        with profiled(True, name) as profile:
+            seen[name] = profile
+            await asyncio.sleep(delay)
+
+    async def run():
+        await asyncio.gather(intent("first", 0.05), intent("second", 0.01))
+        with profiled(True, "third") as profile:
+            seen["third"] = profile
+
+    with caplog.at_level(logging.INFO, logger="agents.telemetry"):
+        asyncio.run(run())
+
+    assert seen["first"] is not None and seen["second"] is None and seen["third"] is not None
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["first.prof", "third.prof"]
+    assert "Not profiling second" in caplog.text
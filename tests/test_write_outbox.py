@@ -0,0 +1,158 @@
+import asyncio
+import collections
+import datetime
+import email.utils
+import os
+import time
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from agents.batch_writer import BatchWriter
+from agents.rate_governor import RateGovernor
+from agents.write_outbox import WriteFailed, WriteOutbox, classify, client_event_id, parse_retry_after
+
+USER = "user-1"
+BASE = datetime.datetime(2030, 1, 7, 9, tzinfo=datetime.timezone.utc)
+
+
+def http_error(status, retry_after=None):
+    headers = {"status": status}
+    if retry_after is not None:
+        headers["retry-after"] = retry_after
+    return HttpError(httplib2.Response(headers), b"{}")
+
+
+@pytest.mark.parametrize("value, expected", [("3", 3.0), ("0.25", 0.25), ("0", 0.0),
+                                             ("-2", None), ("nan", None), ("soon", None), ("", None), (None, None)])
+def test_parse_retry_after_seconds(value, expected):
+    assert parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_http_date():
+    assert 25 < parse_retry_after(email.utils.formatdate(time.time() + 30, usegmt=True)) <= 30
+    assert parse_retry_after(email.utils.formatdate(time.time() - 30, usegmt=True)) is None
+
+
+def test_classify_honours_fractional_and_dated_retry_after():
+    assert classify(http_error(503, "1.5"), "insert") == ("retry", 1.5)
+    outcome, retry_after = classify(http_error(429, email.utils.formatdate(time.time() + 10, usegmt=True)), "update")
+    assert outcome == "retry" and 5 < retry_after <= 10
+    assert classify(http_error(503, "later"), "insert") == ("retry", None)
+
+
+def body(i):
+    start = BASE + datetime.timedelta(hours=i)
+    end = start + datetime.timedelta(minutes=30)
+    return {"summary": f"booking-{i}", "start": {"dateTime": start.isoformat()}, "end": {"dateTime": end.isoformat()}}
+
+
+def booked(stub):
+    # How many live copies of each booking the stub holds.
+    with stub.state.lock:
+        return collections.Counter(e["summary"] for e in stub.state.events.values() if e["status"] != "cancelled")
+
+
+@pytest.fixture
+def writer(stub):
+    return BatchWriter(window=0.005, batch_uri=stub.batch_uri)
+
+
+@pytest.fixture
+def outbox_path(tmp_path):
+    return os.path.join(tmp_path, "calendar_outbox.db")
+
+
+def make_outbox(writer, path, **kwargs):
+    return WriteOutbox(writer, path, base_delay=0.01, max_delay=0.1, poll=0.05, **kwargs)
+
+
+async def book(outbox, service, count):
+    futures = [outbox.submit(USER, "token", service, "insert", client_event_id(USER, i), body(i)) for i in range(count)]
+    return await asyncio.wait_for(asyncio.gather(*futures, return_exceptions=True), timeout=30)
+
+
+async def drain(outbox):
+    while outbox.pending_count():
+        await asyncio.sleep(await outbox.drain_once())
+
+
+def test_transient_and_lost_reply_faults_book_every_event_once(stub, service, writer, outbox_path):
+    # Plain 503s, 429s with a Retry-After, and 503s sent after the insert was applied (reply lost).
+    for status, retry_after, after_commit in [(503, None, False), (429, "0.05", False), (503, None, True)] * 4:
+        stub.state.inject_faults(1, status=status, retry_after=retry_after, after_commit=after_commit)
+    outbox = make_outbox(writer, outbox_path)
+
+    results = asyncio.run(book(outbox, service, 20))
+
+    assert not [r for r in results if isinstance(r, Exception)]
+    assert booked(stub) == {f"booking-{i}": 1 for i in range(20)}
+    assert stub.state.inserts_applied == 20
+    assert outbox.stats["duplicates"] >= 1 and outbox.stats["failed"] == 0
+
+
+def test_permanent_client_error_fails_without_retrying(stub, service, writer, outbox_path):
+    stub.state.inject_faults(1, status=400)
+    outbox = make_outbox(writer, outbox_path)
+
+    (result,) = asyncio.run(book(outbox, service, 1))
+
+    assert isinstance(result, WriteFailed)
+    assert booked(stub) == {}
+    assert outbox.stats == {"writes": 0, "retries": 0, "throttled": 0, "duplicates": 0, "failed": 1}
+    with outbox._lock:
+        assert outbox._conn.execute("SELECT status, attempts FROM outbox").fetchall() == [("failed", 0)]
+
+
+def test_exhausted_insert_is_settled_by_looking_it_up(stub, service, writer, outbox_path):
+    # The only attempt lands but its reply is lost; the event is fetched instead of the row failing.
+    stub.state.inject_faults(1, status=503, after_commit=True)
+    outbox = make_outbox(writer, outbox_path, max_attempts=1)
+
+    (result,) = asyncio.run(book(outbox, service, 1))
+
+    assert result["id"] == client_event_id(USER, 0)
+    assert booked(stub) == {"booking-0": 1}
+    assert outbox.stats["failed"] == 0 and outbox.stats["retries"] == 0
+
+
+def test_exhausted_insert_that_never_landed_fails(stub, service, writer, outbox_path):
+    stub.state.inject_faults(2, status=503)
+    outbox = make_outbox(writer, outbox_path, max_attempts=2)
+
+    (result,) = asyncio.run(book(outbox, service, 1))
+
+    assert isinstance(result, WriteFailed)
+    assert booked(stub) == {}
+    assert outbox.stats["retries"] == 1 and outbox.stats["failed"] == 1
+
+
+def test_governor_throttling_requeues_without_spending_attempts(stub, service, outbox_path):
+    governor = RateGovernor("google", user_rate=20, user_burst=2, project_rate=1000, project_burst=1000, max_wait=0)
+    writer = BatchWriter(window=0.005, batch_uri=stub.batch_uri, governor=governor)
+    outbox = make_outbox(writer, outbox_path, max_attempts=1)
+
+    results = asyncio.run(book(outbox, service, 10))
+
+    assert not [r for r in results if isinstance(r, Exception)]
+    assert booked(stub) == {f"booking-{i}": 1 for i in range(10)}
+    assert outbox.stats["throttled"] > 0 and outbox.stats["failed"] == 0
+
+
+def test_rows_left_by_a_previous_run_are_sent_once_after_restart(stub, service, writer, outbox_path):
+    first = make_outbox(writer, outbox_path)
+    for i in range(6):
+        first.enqueue(USER, "token", "insert", client_event_id(USER, i), body(i), idempotency_key=f"booking-{i}")
+    stub.state.inject_faults(3, status=503, after_commit=True)
+
+    async def service_for(user_key, session_token):
+        assert (user_key, session_token) == (USER, "token")
+        return service
+
+    second = make_outbox(writer, outbox_path, service_for=service_for)
+    asyncio.run(drain(second))
+
+    assert booked(stub) == {f"booking-{i}": 1 for i in range(6)}
+    assert stub.state.inserts_applied == 6
+    assert second.stats["writes"] == 6 and second.stats["duplicates"] == 3
@@ -0,0 +1,110 @@
+import logging
+import os
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from agents.shard_ring import HashRing, shard_urls
+
+logger = logging.getLogger(__name__)
+
+FRONTEND_AGENT_URL = os.environ.get("FRONTEND_AGENT_URL", "http://localhost:8000/submit")
+
+# Only retry when the agent can't have acted on the request yet, so submits stay at-most-once.
+RETRY_STATUSES = {502, 503, 504}
+
+
+def never_sent(exc):
+    # Refused or timed out while connecting. A reset after the request went out may already have been acted on.
+    if isinstance(exc, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(exc.args[0], "reason", None) if exc.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class AgentClient:
+    """Keep-alive, pooled HTTP client for UI -> agent submissions with retries and per-hop timings."""
+
+    def __init__(
+        self,
+        frontend_url=FRONTEND_AGENT_URL,
+        calendar_urls=None,
+        connect_timeout=2.0,
+        read_timeout=10.0,
+        retries=2,
+        backoff=0.2,
+        pool_size=10,
+    ):
+        self.frontend_url = frontend_url
+        # One URL per calendar agent shard, in shard order; users are routed by the same ring the agents use.
+        self.calendar_urls = calendar_urls or shard_urls()
+        self.ring = HashRing(range(len(self.calendar_urls)))
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.timings = defaultdict(lambda: deque(maxlen=500))
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1 + len(self.calendar_urls), pool_maxsize=pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="agent-client")
+        self._lock = threading.Lock()
+
+    def submit(self, hop, url, sender, intent_data):
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                response = self._session.post(
+                    url, json={"sender": sender, "message": intent_data}, timeout=self.timeout
+                )
+                if response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    break
+            except requests.ConnectionError as e:
+                if attempt >= self.retries or not never_sent(e):
+                    raise
+            attempt += 1
+            # Full jitter: spread retries from many sessions instead of stampeding a restarting agent.
+            time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.timings[hop].append(elapsed)
+        logger.info(f"{hop} hop: {response.status_code} in {elapsed * 1000:.1f} ms ({attempt} retries)")
+        return response
+
+    def submit_to_frontend(self, intent_data):
+        return self.submit("frontend", self.frontend_url, "calendar_agent", intent_data)
+
+    def calendar_url_for(self, route_key):
+        return self.calendar_urls[self.ring.node_for(route_key or "")]
+
+    def submit_to_calendar(self, intent_data, route_key=None):
+        return self.submit("calendar", self.calendar_url_for(route_key), "frontend_agent", intent_data)
+
+    def submit_both(self, intent_data, route_key=None):
+        # The two hops don't depend on each other, so send them in parallel.
+        frontend = self._executor.submit(self.submit_to_frontend, intent_data)
+        calendar = self._executor.submit(self.submit_to_calendar, intent_data, route_key)
+        return frontend.result(), calendar.result()
+
+    def prefetch(self, intent_data, route_key=None):
+        # Fire and forget: the caller is about to block on something slower and never reads the reply.
+        future = self._executor.submit(self.submit, "prefetch", self.calendar_url_for(route_key), "frontend_agent", intent_data)
+        future.add_done_callback(lambda f: f.exception() and logger.warning(f"Prefetch failed: {f.exception()}"))
+        return future
+
+    def timing_summary(self):
+        with self._lock:
+            snapshot = {hop: sorted(samples) for hop, samples in self.timings.items()}
+        return {
+            hop: {"p50_ms": statistics.median(samples) * 1000, "max_ms": samples[-1] * 1000, "count": len(samples)}
+            for hop, samples in snapshot.items()
+            if samples
+        }
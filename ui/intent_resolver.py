@@ -0,0 +1,154 @@
+import copy
+import datetime
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIME_ZONE = "America/Los_Angeles"
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+READ_PATTERNS = [
+    re.compile(r"^(?:show|list|get|display|see)(?: me)?(?: all)?(?: of)?(?: my| the)?(?: upcoming| next)? (?:events|meetings|calendar|schedule|agenda)$"),
+    re.compile(r"^what(?:'s| is) (?:on my calendar|my schedule|coming up|next)$"),
+    re.compile(r"^what (?:do i have|events do i have)(?: coming up)?$"),
+]
+
+CREATE_PATTERN = re.compile(
+    r"^(?:please )?(?:schedule|book|add|create|set up) (?:an? )?(?P<title>.+?) "
+    r"(?P<day>today|tomorrow|(?:on |next )?(?:" + "|".join(WEEKDAYS) + r")) "
+    r"at (?P<hour>\d{1,2})(?::(?P<minute>\d{2}))? ?(?P<ampm>am|pm)$",
+    re.IGNORECASE,
+)
+# Looser than CREATE_PATTERN: only used to guess which day a prompt is about while the LLM parses it.
+SCHEDULING_HINT = re.compile(r"\b(?:schedule|book|add|create|set up|put|plan|move|reschedule)\b", re.IGNORECASE)
+DAY_HINT = re.compile(
+    r"\b(?P<day>today|tonight|tomorrow|(?:next )?(?:" + "|".join(WEEKDAYS) + r"))\b|\b(?P<date>\d{4}-\d{2}-\d{2})\b",
+    re.IGNORECASE,
+)
+
+
+def normalize_prompt(prompt):
+    return re.sub(r"\s+", " ", prompt).strip().rstrip(".!?").strip()
+
+
+def resolve_day(day, today):
+    day = day.lower()
+    if day in ("today", "tonight"):
+        return today
+    if day == "tomorrow":
+        return today + datetime.timedelta(days=1)
+    weekday = WEEKDAYS.index(day.split()[-1])
+    return today + datetime.timedelta(days=(weekday - today.weekday()) % 7 or 7)
+
+
+def guess_window(text, today, time_zone):
+    """The whole day a scheduling prompt most likely refers to, as (start, end), or None.
+
+    A cheap guess made before the LLM answers, so it only ever decides what to prefetch.
+    """
+    if not SCHEDULING_HINT.search(text):
+        return None
+    match = DAY_HINT.search(text)
+    if match is None:
+        return None
+    if match["date"]:
+        try:
+            date = datetime.date.fromisoformat(match["date"])
+        except ValueError:
+            return None
+    else:
+        date = resolve_day(match["day"], today)
+    start = datetime.datetime.combine(date, datetime.time(), time_zone)
+    return start, start + datetime.timedelta(days=1)
+
+
+class IntentResolver:
+    """Resolves chat prompts to intent dicts: regex fast path, then a prompt cache, then the LLM."""
+
+    def __init__(self, llm_fn, cache_size=512, ttl=3600, time_zone=DEFAULT_TIME_ZONE, speculate=None):
+        self.llm_fn = llm_fn
+        # speculate(start, end) is called just before an LLM call with the window the prompt is probably
+        # about; it must not block, since its point is to overlap with the LLM round trip.
+        self.speculate = speculate
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.time_zone = ZoneInfo(time_zone)
+        self.stats = {"rules": 0, "cache": 0, "llm": 0}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resolve(self, prompt):
+        started = time.perf_counter()
+        text = normalize_prompt(prompt)
+        today = datetime.datetime.now(self.time_zone).date()
+
+        intent, layer = self._match_rules(text, today), "rules"
+        if intent is None:
+            # Relative dates ("tomorrow") mean different things on different days, so the anchor is part of the key.
+            key = (text.lower(), today.isoformat())
+            intent, layer = self._cache_get(key), "cache"
+            if intent is None:
+                window = self.speculate and guess_window(text, today, self.time_zone)
+                if window:
+                    try:
+                        self.speculate(*window)
+                    except Exception:
+                        # A failed guess only means the conflict check loads as usual.
+                        logger.exception("Speculative prefetch failed")
+                intent, layer = self.llm_fn(prompt), "llm"
+                self._cache_put(key, intent)
+
+        self.stats[layer] += 1
+        total = sum(self.stats.values())
+        logger.info(
+            f"Intent resolved via {layer} in {(time.perf_counter() - started) * 1000:.1f} ms "
+            f"(rules {self.stats['rules'] / total:.0%}, cache {self.stats['cache'] / total:.0%}, "
+            f"llm {self.stats['llm'] / total:.0%} of {total})"
+        )
+        return copy.deepcopy(intent)
+
+    def _match_rules(self, text, today):
+        lowered = text.lower()
+        if any(pattern.match(lowered) for pattern in READ_PATTERNS):
+            return {"type": "read_events"}
+
+        match = CREATE_PATTERN.match(text)
+        if match is None:
+            return None
+        hour, minute = int(match["hour"]), int(match["minute"] or 0)
+        if not 1 <= hour <= 12 or minute > 59:
+            return None
+        hour = hour % 12 + (12 if match["ampm"].lower() == "pm" else 0)
+        date = resolve_day(match["day"], today)
+        start = datetime.datetime.combine(date, datetime.time(hour, minute), self.time_zone)
+        title = match["title"]
+        return {
+            "type": "create_event",
+            "title": title[0].upper() + title[1:],
+            "start_time": start.isoformat(),
+            "end_time": (start + datetime.timedelta(hours=1)).isoformat(),
+        }
+
+    def _cache_get(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            intent, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return intent
+
+    def _cache_put(self, key, intent):
+        with self._lock:
+            self._cache[key] = (copy.deepcopy(intent), time.monotonic())
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
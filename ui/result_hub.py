@@ -0,0 +1,144 @@
+import json
+import logging
+import statistics
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from agents.telemetry import metrics
+from models.envelope import CONTENT_TYPE, unpack
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8100
+RESULT_RETENTION = 10 * 60
+
+
+def merge_chunks(chunks):
+    # Streamed chunks collapse into one result carrying every message in order.
+    messages = [chunk.get("message") for chunk in chunks if chunk.get("message")]
+    return dict(chunks[-1], message="\n".join(messages), more=None)
+
+
+class _Server(ThreadingHTTPServer):
+    # Agents push in bursts; past the default listen backlog of 5 a push waits out a 1 s SYN retry.
+    request_queue_size = 128
+    daemon_threads = True
+
+
+class ResultHub:
+    """Mailbox the agents push finished intents into; UI sessions long-poll it by request_id."""
+
+    def __init__(self, history=1000):
+        # request_id -> [chunks not yet handed out, final chunk seen, last update]
+        self._results = {}
+        self._started = {}
+        self._cond = threading.Condition()
+        self.latencies = deque(maxlen=history)
+
+    def expect(self, request_id):
+        now = time.monotonic()
+        with self._cond:
+            self._started[request_id] = now
+            self._expire(now)
+
+    def _expire(self, now):
+        # Results nobody came back for, and requests that never got one, don't live forever.
+        for stale in [rid for rid, (_, _, at) in self._results.items() if now - at > RESULT_RETENTION]:
+            del self._results[stale]
+        for stale in [rid for rid, at in self._started.items() if now - at > RESULT_RETENTION]:
+            del self._started[stale]
+
+    def publish(self, data):
+        request_id = data.get("request_id")
+        if not request_id:
+            return
+        now = time.monotonic()
+        with self._cond:
+            # Latency is time to the first chunk, which is what the user waits on.
+            started = self._started.pop(request_id, None)
+            if started is not None:
+                self.latencies.append(now - started)
+            entry = self._results.setdefault(request_id, [[], False, now])
+            entry[0].append(data)
+            entry[1] = entry[1] or not data.get("more")
+            entry[2] = now
+            self._expire(now)
+            self._cond.notify_all()
+        if started is not None:
+            logger.info(f"Result for {request_id} after {(now - started) * 1000:.0f} ms ({self.latency_summary()})")
+
+    def _finished(self, request_id):
+        entry = self._results.get(request_id)
+        return entry is not None and entry[1]
+
+    def wait(self, request_id, timeout):
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._finished(request_id), timeout):
+                return None
+            chunks, _, _ = self._results.pop(request_id)
+        return merge_chunks(chunks)
+
+    def stream(self, request_id, timeout):
+        """Yield result chunks for request_id as they arrive, ending after the final one or the timeout."""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._results.get(request_id, [[]])[0], deadline - time.monotonic()
+                )
+                entry = self._results.get(request_id)
+                if entry is None or not entry[0]:
+                    return
+                chunks, done = entry[0], entry[1]
+                entry[0] = []
+                if done:
+                    del self._results[request_id]
+            yield from chunks
+            if done:
+                return
+
+    def collect(self, session_id):
+        # Results that arrived after their request stopped waiting, for the next rerun to show.
+        with self._cond:
+            ready = [
+                rid for rid, (chunks, done, _) in self._results.items()
+                if done and chunks and chunks[-1].get("session_id") == session_id
+            ]
+            return [merge_chunks(self._results.pop(rid)[0]) for rid in ready]
+
+    def latency_summary(self):
+        with self._cond:
+            samples = sorted(self.latencies)
+        if not samples:
+            return "no samples"
+        p50 = statistics.median(samples)
+        p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+        return f"p50 {p50 * 1000:.0f} ms, p99 {p99 * 1000:.0f} ms over {len(samples)}"
+
+    def serve(self, host="127.0.0.1", port=DEFAULT_PORT):
+        hub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                # The UI's stage histograms, in the same format as the agents' metrics endpoints.
+                metrics.handle_get(self)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    body = self.rfile.read(length)
+                    hub.publish(unpack(body) if self.headers.get("Content-Type") == CONTENT_TYPE else json.loads(body))
+                    self.send_response(204)
+                except ValueError:
+                    self.send_response(400)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+        server = _Server((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server